@@ -0,0 +1,234 @@
+'''
+Timings for the hot paths: packing, find_neighbor() per edge and LOD, the geometry conversions, and
+the NumPy batch versions (if NumPy is installed). Every run uses the same random faces and points
+(from a fixed seed), and writes the results as JSON, so that two commits or two backends can be
+compared:
+
+    PYTHONPATH=src python benchmarks/run_benchmarks.py -o before.json
+    ... change something ...
+    PYTHONPATH=src python benchmarks/run_benchmarks.py -o after.json --compare before.json
+
+With --compare, the script exits with status 1 if any timing got slower by more than --threshold.
+Times are the best of several repeats, in nanoseconds per call (or per element, for the batch
+versions), and include the cost of the Python loop around the call.
+'''
+from __future__ import annotations
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+from math import pi
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import delta20
+from delta20.curve import curve_key, from_curve_key
+from delta20.geometry import _get_triangle, get_face_center, get_lat_long, get_vector, locate, locate_lat_long
+from delta20.indexing import find_neighbor
+from delta20.packing import get_pos, pack_face_idx, unpack_face_idx
+
+SEED = 20
+FORMAT_VERSION = 1
+
+
+def _no_setup() -> None:
+    pass
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # The function to time, and the number of calls or elements it makes.
+    fn: Callable[[], object]
+    ops: int
+    # Run before each timed repeat, untimed (eg, to empty a cache).
+    setup: Callable[[], object] = _no_setup
+
+
+def _random_fields(rng: random.Random, count: int, lod: int) -> List[Tuple[int, int, int]]:
+    return [(lod, rng.randrange(20), rng.getrandbits(2 * lod) << (46 - 2 * lod)) for _ in range(count)]
+
+
+def _random_points(rng: random.Random, count: int) -> List[Tuple[float, float]]:
+    # (In radians, uniform in latitude rather than area, which is fine for timing.)
+    return [(rng.uniform(-pi / 2, pi / 2), rng.uniform(-pi, pi)) for _ in range(count)]
+
+
+def scalar_benchmarks(count: int, lods: Sequence[int]) -> List[Benchmark]:
+    rng = random.Random(SEED)
+    result: List[Benchmark] = []
+
+    # Step #1 - packing, on faces spread over every LOD.
+    fields = [f for lod in range(23) for f in _random_fields(rng, count // 23 + 1, lod)]
+    faces = [pack_face_idx(lod, d20, path) for lod, d20, path in fields]
+    with_south = [(lod, d20, path, bool(face & 0b1)) for (lod, d20, path), face in zip(fields, faces)]
+
+    def pack_auto() -> None:
+        for lod, d20, path in fields:
+            pack_face_idx(lod, d20, path)
+
+    def pack_given() -> None:
+        for lod, d20, path, is_south in with_south:
+            pack_face_idx(lod, d20, path, is_south)
+
+    def unpack() -> None:
+        for face in faces:
+            unpack_face_idx(face)
+
+    def pos() -> None:
+        for lod, _, path in fields:
+            get_pos(path, lod)
+
+    keys = [curve_key(face) for face in faces]
+
+    def to_curve() -> None:
+        for face in faces:
+            curve_key(face)
+
+    def from_curve() -> None:
+        for key in keys:
+            from_curve_key(key)
+
+    result += [Benchmark("pack_face_idx/auto_polarity", pack_auto, len(fields)),
+               Benchmark("pack_face_idx/given_polarity", pack_given, len(fields)),
+               Benchmark("unpack_face_idx", unpack, len(faces)),
+               Benchmark("get_pos", pos, len(fields)),
+               Benchmark("curve_key", to_curve, len(faces)),
+               Benchmark("from_curve_key", from_curve, len(keys))]
+
+    # Step #2 - find_neighbor(), per edge and LOD. The deeper the LOD, the more digits there are to
+    # turn on, and the rarer the d20 crossings.
+    for lod in lods:
+        lod_faces = [pack_face_idx(*f) for f in _random_fields(rng, count, lod)]
+        for edge in range(3):
+            def neighbor(lod_faces: List[int] = lod_faces, edge: int = edge) -> None:
+                for face in lod_faces:
+                    find_neighbor(face, edge)
+            result.append(Benchmark(f"find_neighbor/lod{lod:02d}/edge{edge}", neighbor, len(lod_faces)))
+
+    # Step #3 - geometry.
+    points = _random_points(rng, count)
+    vectors = [get_vector(lat, lon) for lat, lon in points]
+    deep_faces = [pack_face_idx(*f) for f in _random_fields(rng, count, 18)]
+
+    def to_vector() -> None:
+        for lat, lon in points:
+            get_vector(lat, lon)
+
+    def to_lat_long() -> None:
+        for x, y, z in vectors:
+            get_lat_long(x, y, z)
+
+    def locate_vectors() -> None:
+        for x, y, z in vectors:
+            locate(x, y, z, 18)
+
+    def locate_points() -> None:
+        for lat, lon in points:
+            locate_lat_long(lat, lon, 18)
+
+    # get_face_center() builds each triangle from its ancestors', through the _get_triangle() cache.
+    # Cold, every face builds its whole chain of ancestors; warm (the same faces again), it is all
+    # cache hits.
+    def centers() -> None:
+        for face in deep_faces:
+            get_face_center(face)
+
+    result += [Benchmark("get_vector", to_vector, len(points)),
+               Benchmark("get_lat_long", to_lat_long, len(vectors)),
+               Benchmark("locate/lod18", locate_vectors, len(vectors)),
+               Benchmark("locate_lat_long/lod18", locate_points, len(points)),
+               Benchmark("get_face_center/lod18/cold", centers, len(deep_faces), _get_triangle.cache_clear),
+               Benchmark("get_face_center/lod18/warm", centers, len(deep_faces), centers)]
+    return result
+
+
+def batch_benchmarks(count: int) -> List[Benchmark]:
+    try:
+        import numpy as np
+        from delta20.batch import find_neighbors_batch, locate_many, pack_many, unpack_many
+    except ImportError:
+        return []
+
+    rng = np.random.default_rng(SEED)
+    lod = rng.integers(0, 23, count)
+    d20 = rng.integers(0, 20, count)
+    unused = (46 - 2 * lod).astype(np.uint64)
+    path = rng.integers(0, 1 << 46, count, dtype=np.uint64) >> unused << unused
+    faces = pack_many(lod, d20, path)
+    lat, lon = rng.uniform(-pi / 2, pi / 2, count), rng.uniform(-pi, pi, count)
+
+    return [Benchmark("batch/pack_many", lambda: pack_many(lod, d20, path), count),
+            Benchmark("batch/unpack_many", lambda: unpack_many(faces), count),
+            Benchmark("batch/find_neighbors_batch", lambda: find_neighbors_batch(faces, 1), count),
+            Benchmark("batch/locate_many/lod18", lambda: locate_many(lat, lon, 18), count)]
+
+
+def run(benchmarks: Sequence[Benchmark], repeat: int, name_filter: Optional[str]) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn, ops, setup in benchmarks:
+        if name_filter and name_filter not in name:
+            continue
+        best = min(timeit.repeat(fn, setup=setup, number=1, repeat=repeat))
+        results[name] = {"ns_per_op": best / ops * 1e9, "ops": ops}
+        print(f"{name:40s} {results[name]['ns_per_op']:12.1f} ns")
+    return results
+
+
+def _get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float) -> bool:
+    '''
+    Prints each timing against the baseline file's, and returns whether none got slower by more
+    than the threshold (a ratio, eg 1.2 for 20%).
+    '''
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    ok = True
+    print(f"\n{'':40s} {'baseline':>12s} {'now':>12s} {'ratio':>8s}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["ns_per_op"] / baseline[name]["ns_per_op"]
+        slower = ratio > threshold
+        ok &= not slower
+        print(f"{name:40s} {baseline[name]['ns_per_op']:12.1f} {result['ns_per_op']:12.1f} {ratio:8.2f}"
+              f"{'  SLOWER' if slower else ''}")
+    return ok
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", help="where to write the JSON results")
+    parser.add_argument("--compare", metavar="BASELINE", help="a previous JSON results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="the slowdown ratio that fails --compare")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="fewer calls, fewer LODs and fewer repeats")
+    args = parser.parse_args(argv)
+
+    count, batch_count, repeat = (200, 10_000, 3) if args.quick else (2000, 200_000, 7)
+    lods = (0, 1, 11, 22) if args.quick else tuple(range(23))
+    results = run(scalar_benchmarks(count, lods) + batch_benchmarks(batch_count), repeat, args.filter)
+
+    if args.output:
+        meta = {"format": FORMAT_VERSION, "commit": _get_commit(), "backend": delta20.BACKEND,
+                "python": platform.python_version(), "machine": platform.machine(),
+                "platform": platform.platform(), "seed": SEED, "quick": args.quick,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=1, sort_keys=True)
+    if args.compare:
+        return 0 if compare(results, args.compare, args.threshold) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+'''
+Plain setuptools shim so the hot packing and indexing modules can optionally be compiled with
+mypyc. All the metadata lives in pyproject.toml. A normal install is pure Python; to build the
+compiled backend, install mypy alongside setuptools and set DELTA20_COMPILE=1:
+
+    pip install mypy
+    DELTA20_COMPILE=1 pip install --no-build-isolation .
+'''
+import os
+from setuptools import setup
+
+ext_modules = []
+if os.environ.get("DELTA20_COMPILE", "0") not in ("", "0"):
+    from mypyc.build import mypycify
+    ext_modules = mypycify(["src/delta20/packing.py", "src/delta20/indexing.py"], opt_level="3")
+
+setup(ext_modules=ext_modules)
@@ -1,2 +1,10 @@
-__all__ = ["__version__"]
+from importlib.machinery import EXTENSION_SUFFIXES as _EXTENSION_SUFFIXES
+from delta20 import indexing as _indexing, packing as _packing
+
+__all__ = ["__version__", "BACKEND"]
 __version__ = "0.0.1"
+
+# Which implementation of the hot packing and indexing functions is active: "mypyc" when they were
+# built as compiled extensions (see setup.py), otherwise "python".
+BACKEND = "mypyc" if all(str(m.__file__).endswith(tuple(_EXTENSION_SUFFIXES))
+                         for m in (_packing, _indexing)) else "python"
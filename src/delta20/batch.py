@@ -0,0 +1,458 @@
+'''
+NumPy array variants of the scalar packing and indexing functions. NumPy is an optional dependency,
+so nothing in the core package imports this module; install the "numpy" extra to use it.
+'''
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from delta20.curve import _BYTE_SHIFTS, _CURVE_STEP, _CURVE_UNSTEP, curve_key
+from delta20.curve import _D20_CURVE, _D20_CURVE_POS, _D20_CURVE_STATE
+from delta20.indexing import _BASE_SOUTH as _BASE_SOUTH_BOOL
+from delta20.indexing import _CROSSING_EDGES as _CROSSING_EDGES_INT
+from delta20.indexing import _EDGE_DIGITS as _EDGE_DIGITS_INT
+from delta20.indexing import _EDGE_REFLECT as _EDGE_REFLECT_INT
+from delta20.indexing import _HEADER_MASK as _HEADER_MASK_INT
+from delta20.geometry import _D20_VERTS, _FACE_NORMALS
+from delta20.packing import _digit_lo_bits, _lod_path_bits
+from delta20.precomputed.raw_d20 import raw_neighbors
+
+_U64 = np.uint64
+
+# Every element is a FaceIdx, so the field positions match packing.py.
+_LOD_SHIFT = _U64(59)
+_D20_SHIFT = _U64(54)
+_PATH_SHIFT = _U64(8)
+_FIELD_MASK = _U64(0b11111)
+_PATH_MASK = _U64((1 << 46) - 1)
+
+# The neighbor tables from indexing.py, as arrays. See find_neighbor() for how they are used.
+_HEADER_MASK = _U64(_HEADER_MASK_INT)
+_EDGE_DIGITS = np.array(_EDGE_DIGITS_INT, dtype=_U64)
+_EDGE_REFLECT = np.array(_EDGE_REFLECT_INT, dtype=_U64)
+_RAW_NEIGHBORS = np.array(raw_neighbors, dtype=_U64)
+_BASE_SOUTH = np.array(_BASE_SOUTH_BOOL, dtype=_U64)
+_CROSSING_EDGES = np.array(_CROSSING_EDGES_INT, dtype=np.uint8)
+
+# The packed-path tables from packing.py, as arrays.
+_LOD_PATH_BITS = np.array(_lod_path_bits, dtype=_U64)
+_DIGIT_LO_BITS = _U64(_digit_lo_bits)
+_D20_MASK = _FIELD_MASK << _D20_SHIFT
+
+# The curve tables from curve.py, as arrays.
+_CURVE_STEP_ARRAY = np.array(_CURVE_STEP, dtype=_U64)
+_CURVE_UNSTEP_ARRAY = np.array(_CURVE_UNSTEP, dtype=_U64)
+_CURVE_POS = np.array(_D20_CURVE_POS, dtype=_U64)
+_CURVE_STATE = np.array(_D20_CURVE_STATE, dtype=_U64)
+_CURVE_D20 = np.array([d20 for d20, _, _ in _D20_CURVE], dtype=_U64)
+_CURVE_START = np.array([3 * entry + exit_corner for _, entry, exit_corner in _D20_CURVE], dtype=_U64)
+
+# The point location tables from geometry.py, as arrays. See locate() for how they are used.
+_FACE_NORMAL_ARRAYS = tuple((n[0], n[1], n[2], face, opposite) for n, face, opposite in _FACE_NORMALS)
+_D20_VERT_ARRAY = np.array(_D20_VERTS, dtype=np.float64)
+
+
+def find_neighbors_batch(face_ids: np.ndarray,
+                         edges: Union[np.ndarray, int]) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Array version of indexing.find_neighbor(). Given an array of FaceIdx values and the edges to
+    cross (an array of the same shape, or a single edge for all), returns an array of the
+    neighbors' FaceIdx values and an array of the edges the neighbors would use to return.
+    '''
+    face_ids, edges = np.broadcast_arrays(np.asarray(face_ids, dtype=_U64),
+                                          np.asarray(edges, dtype=np.uint8))
+    shape = face_ids.shape
+    face_ids, edges = face_ids.ravel(), edges.ravel()
+    if edges.size and edges.max() > 2:
+        raise ValueError("Edges outside 0..2 are not permitted.")
+
+    lod = face_ids >> _LOD_SHIFT
+    if lod.size and lod.max() >= 23:
+        raise ValueError("LODs outside 0..22 are not permitted.")
+    is_south = face_ids & _U64(0b1)
+    # As in find_neighbor(), the digits stay where they sit in the FaceIdx.
+    lod_mask = _LOD_PATH_BITS[lod]
+    path = face_ids & lod_mask
+
+    # Step #1 - the descent. The finest digit that is a 3 or equal to the edge marks the common
+    # ancestor with the neighbor. Flag the matching digits (in the low bit of each 2-bit slot) and
+    # isolate the lowest flag, for every element at once.
+    lo = path & _DIGIT_LO_BITS
+    hi = (path >> _U64(1)) & _DIGIT_LO_BITS
+    same = path ^ _EDGE_DIGITS[edges]
+    is_edge = ~(same | (same >> _U64(1))) & _DIGIT_LO_BITS
+    turning = (lo & hi) | is_edge
+    turning &= lod_mask
+    lowest = turning & (~turning + _U64(1))
+    crossing = turning == 0
+
+    # Step #2 - the ascent, for neighbors within the same d20 face. The turning digit swaps 3 <-> edge
+    # and every finer digit is reflected across the edge, which is one XOR over those digits.
+    below = (lowest << _U64(2)) - _U64(1)
+    nbr_ids = (face_ids & _HEADER_MASK) | (path ^ (_EDGE_REFLECT[edges] & below & lod_mask))
+    nbr_south = is_south ^ _U64(1)
+    nbr_edges = edges.copy()
+
+    # Step #3 - the triangles that never turned lie along their d20 face's edge, so the neighbor is
+    # in the adjacent d20 face. Contra-polar crossings reflect every digit just like above. Co-polar
+    # crossings leave 0s alone and turn the other corner digit into the edge, ie, XOR 3 on every
+    # nonzero digit.
+    if crossing.any():
+        c_edges = edges[crossing]
+        c_path = path[crossing]
+        c_d20 = _RAW_NEIGHBORS[(face_ids[crossing] >> _D20_SHIFT) & _FIELD_MASK, c_edges]
+        c_south = _BASE_SOUTH[c_d20]
+        copolar = c_south == is_south[crossing]
+        nonzero = (c_path | (c_path >> _U64(1))) & _DIGIT_LO_BITS
+        reflected = np.where(copolar, nonzero * _U64(3), _EDGE_REFLECT[c_edges] & lod_mask[crossing])
+        nbr_ids[crossing] = (lod[crossing] << _LOD_SHIFT) | (c_d20 << _D20_SHIFT) | (c_path ^ reflected)
+        nbr_south[crossing] = c_south
+        nbr_edges[crossing] = _CROSSING_EDGES[copolar.astype(np.uint8), c_edges]
+
+    # Done.
+    nbr_ids |= nbr_south
+    return nbr_ids.reshape(shape), nbr_edges.reshape(shape)
+
+
+def _locate_chunk(x: np.ndarray, y: np.ndarray, z: np.ndarray, lod: int) -> np.ndarray:
+    '''
+    The vectorized body of geometry.locate(), for one chunk of vectors. It follows the scalar code
+    operation for operation, so the two agree even for points on cell boundaries.
+    '''
+    # Step #1 - pick the d20 face from the face-normal table.
+    best = np.zeros(x.shape, dtype=np.float64)
+    d20 = np.full(x.shape, -1, dtype=np.int64)
+    for nx, ny, nz, face, opposite in _FACE_NORMAL_ARRAYS:
+        dot = nx * x + ny * y + nz * z
+        pick = dot > best
+        d20[pick], best[pick] = face, dot[pick]
+        pick = ~pick & (-dot > best)
+        d20[pick], best[pick] = opposite, -dot[pick]
+    if (d20 < 0).any():
+        raise ValueError("Cannot locate a zero vector.")
+
+    # Step #2 - descend, testing against the edge-midpoint planes at each LOD. The digit picks the
+    # child's corners from (corner, midpoint) candidates.
+    corners = _D20_VERT_ARRAY[d20]
+    ax, ay, az = corners[:, 0, 0], corners[:, 0, 1], corners[:, 0, 2]
+    bx, by, bz = corners[:, 1, 0], corners[:, 1, 1], corners[:, 1, 2]
+    cx, cy, cz = corners[:, 2, 0], corners[:, 2, 1], corners[:, 2, 2]
+    is_south = _BASE_SOUTH[d20]
+    path = np.zeros(x.shape, dtype=_U64)
+    for _ in range(lod):
+        m01x, m01y, m01z = ax + bx, ay + by, az + bz
+        r = 1.0 / np.sqrt(m01x * m01x + m01y * m01y + m01z * m01z)
+        m01x, m01y, m01z = m01x * r, m01y * r, m01z * r
+        m12x, m12y, m12z = bx + cx, by + cy, bz + cz
+        r = 1.0 / np.sqrt(m12x * m12x + m12y * m12y + m12z * m12z)
+        m12x, m12y, m12z = m12x * r, m12y * r, m12z * r
+        m20x, m20y, m20z = cx + ax, cy + ay, cz + az
+        r = 1.0 / np.sqrt(m20x * m20x + m20y * m20y + m20z * m20z)
+        m20x, m20y, m20z = m20x * r, m20y * r, m20z * r
+
+        in_0 = x * (m01y * m20z - m01z * m20y) + y * (m01z * m20x - m01x * m20z) \
+            + z * (m01x * m20y - m01y * m20x) > 0.0
+        in_1 = x * (m12y * m01z - m12z * m01y) + y * (m12z * m01x - m12x * m01z) \
+            + z * (m12x * m01y - m12y * m01x) > 0.0
+        in_2 = x * (m20y * m12z - m20z * m12y) + y * (m20z * m12x - m20x * m12z) \
+            + z * (m20x * m12y - m20y * m12x) > 0.0
+        digit = np.where(in_0, 0, np.where(in_1, 1, np.where(in_2, 2, 3))).astype(np.uint8)
+
+        # Child 0 is (V0, M01, M20), 1 is (M01, V1, M12), 2 is (M20, M12, V2), 3 is (M12, M20, M01).
+        ax, ay, az = (np.choose(digit, (ax, m01x, m20x, m12x)), np.choose(digit, (ay, m01y, m20y, m12y)),
+                      np.choose(digit, (az, m01z, m20z, m12z)))
+        bx, by, bz = (np.choose(digit, (m01x, bx, m12x, m20x)), np.choose(digit, (m01y, by, m12y, m20y)),
+                      np.choose(digit, (m01z, bz, m12z, m20z)))
+        cx, cy, cz = (np.choose(digit, (m20x, m12x, cx, m01x)), np.choose(digit, (m20y, m12y, cy, m01y)),
+                      np.choose(digit, (m20z, m12z, cz, m01z)))
+        path = (path << _U64(2)) | digit
+        is_south = is_south ^ (digit == 3)
+
+    # Done.
+    return (_U64(lod) << _LOD_SHIFT) | (d20.astype(_U64) << _D20_SHIFT) \
+        | (path << _U64(8 + (23 - lod) * 2)) | is_south
+
+
+def locate_many(lat: np.ndarray, lon: np.ndarray, lod: int, chunk_size: int = 1 << 12,
+                threads: int = 1) -> np.ndarray:
+    '''
+    Array version of geometry.locate_lat_long(). Given arrays of latitudes and longitudes (in
+    radians), returns the FaceIdx values of the triangles at the given LOD that contain them.
+
+    The work proceeds in chunks of 'chunk_size' points, which keeps the temporaries in cache. NumPy
+    releases the GIL inside its array operations, so with threads > 1 the chunks are split across a
+    thread pool and run in parallel. Callers with their own pool can just as well hand each thread a
+    slice of the input.
+    '''
+    if lod < 0 or lod >= 23:
+        raise ValueError(f"LODs outside 0..22 are not permitted ({lod}).")
+    lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64))
+    shape = lat.shape
+    lat, lon = lat.ravel(), lon.ravel()
+    result = np.empty(lat.shape, dtype=_U64)
+
+    def run(start: int) -> None:
+        # (geometry.get_vector(), vectorized)
+        chunk_lat, chunk_lon = lat[start:start + chunk_size], lon[start:start + chunk_size]
+        cl = np.cos(chunk_lat)
+        x, y, z = cl * np.cos(chunk_lon), np.sin(chunk_lat), cl * np.sin(chunk_lon)
+        r = np.sqrt(x * x + y * y + z * z)
+        result[start:start + chunk_size] = _locate_chunk(x / r, y / r, z / r, lod)
+
+    starts = range(0, lat.size, chunk_size)
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for _ in pool.map(run, starts):
+                pass
+    else:
+        for start in starts:
+            run(start)
+    return result.reshape(shape)
+
+
+_bitwise_count = getattr(np, "bitwise_count", None)
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    '''
+    Returns the number of set bits in each element of a uint64 array. (NumPy 2 has this built in;
+    older versions get the SWAR method.)
+    '''
+    if _bitwise_count is not None:
+        return np.asarray(_bitwise_count(x), dtype=_U64)
+    x = x - ((x >> _U64(1)) & _U64(0x5555555555555555))
+    x = (x & _U64(0x3333333333333333)) + ((x >> _U64(2)) & _U64(0x3333333333333333))
+    x = (x + (x >> _U64(4))) & _U64(0x0F0F0F0F0F0F0F0F)
+    return (x * _U64(0x0101010101010101)) >> _U64(56)
+
+
+def _parity_of_threes(path_bits: np.ndarray) -> np.ndarray:
+    '''
+    Given packed path bits (digits in place, as in a FaceIdx), returns 1 where they hold an odd
+    number of 3s, else 0. That is how much each face's polarity differs from its d20 face's.
+    '''
+    return _popcount(path_bits & (path_bits >> _U64(1)) & _DIGIT_LO_BITS) & _U64(0b1)
+
+
+def to_range_keys(face_ids: np.ndarray) -> np.ndarray:
+    '''
+    Array version of packing.to_range_key().
+    '''
+    face_ids = np.asarray(face_ids, dtype=_U64)
+    lod = (face_ids >> _LOD_SHIFT) & _FIELD_MASK
+    if lod.size and lod.max() >= 23:
+        raise ValueError("LODs outside 0..22 are not permitted.")
+    return np.asarray(((face_ids & _D20_MASK) << _U64(5)) | ((face_ids & _LOD_PATH_BITS[lod]) << _U64(5))
+                      | (_U64(1) << (_U64(58) - _U64(2) * lod)), dtype=_U64)
+
+
+def from_range_keys(keys: np.ndarray) -> np.ndarray:
+    '''
+    Array version of packing.from_range_key().
+    '''
+    keys = np.asarray(keys, dtype=_U64)
+    terminator = keys & (~keys + _U64(1))
+    # The terminator is a power of two, which a float64 holds exactly.
+    shift = (np.frexp(terminator.astype(np.float64))[1] - 1).astype(np.int64)
+    d20 = keys >> _U64(59)
+    if ((keys == 0) | (shift < 14) | ((shift & 0b1) != 0) | (d20 >= 20)).any():
+        raise ValueError("Not a valid range key.")
+    lod = ((58 - shift) >> 1).astype(_U64)
+    path_bits = ((keys ^ terminator) >> _U64(5)) & _LOD_PATH_BITS[lod]
+    is_south = _BASE_SOUTH[d20] ^ _parity_of_threes(path_bits)
+    return np.asarray((lod << _LOD_SHIFT) | (d20 << _D20_SHIFT) | path_bits | is_south, dtype=_U64)
+
+
+# <--------------------packing--------------------->
+# The fields unpack_many() returns.
+FACE_IDX_DTYPE = np.dtype([("lod", np.uint8), ("d20", np.uint8), ("path", _U64), ("is_south", np.bool_)])
+
+
+def pack_many(lod: np.ndarray, d20: np.ndarray, path: np.ndarray, is_south: Optional[np.ndarray] = None) -> np.ndarray:
+    '''
+    Array version of packing.pack_face_idx(). The arguments broadcast against each other. Without
+    is_south, the polarity is counted from the digit-3s of each path, all at once.
+    '''
+    lod, d20, path = np.broadcast_arrays(np.asarray(lod, dtype=np.int64), np.asarray(d20, dtype=np.int64),
+                                         np.asarray(path, dtype=_U64))
+    if lod.size:
+        if lod.min() < 0 or lod.max() >= 23:
+            raise ValueError("LODs outside 0..22 are not permitted.")
+        if d20.min() < 0 or d20.max() >= 20:
+            raise ValueError("D20 faces outside 0..19 are not permitted.")
+        if path.max() >= _U64(1 << 46):
+            raise ValueError("Paths must fit in 46 bits.")
+    lod, d20 = lod.astype(_U64), d20.astype(_U64)
+    path_bits = path << _PATH_SHIFT
+    if is_south is None:
+        south = _BASE_SOUTH[d20] ^ _parity_of_threes(path_bits & _LOD_PATH_BITS[lod])
+    else:
+        south = np.broadcast_to(np.asarray(is_south, dtype=bool), lod.shape).astype(_U64)
+    return np.asarray((lod << _LOD_SHIFT) | (d20 << _D20_SHIFT) | path_bits | south, dtype=_U64)
+
+
+def unpack_many(face_ids: np.ndarray) -> np.ndarray:
+    '''
+    Array version of packing.unpack_face_idx(). Returns a structured array of FACE_IDX_DTYPE, with
+    fields lod, d20, path and is_south.
+    '''
+    face_ids = np.asarray(face_ids, dtype=_U64)
+    result = np.empty(face_ids.shape, dtype=FACE_IDX_DTYPE)
+    result["lod"] = face_ids >> _LOD_SHIFT
+    result["d20"] = (face_ids >> _D20_SHIFT) & _FIELD_MASK
+    result["path"] = (face_ids >> _PATH_SHIFT) & _PATH_MASK
+    result["is_south"] = (face_ids & _U64(0b1)) != 0
+    return result
+
+
+def build_paths(digits: np.ndarray) -> np.ndarray:
+    '''
+    Array version of packing.build_path(). Each row of the (n, lod) matrix holds one path's digits,
+    coarsest first; returns the n left-aligned paths.
+    '''
+    digits = np.asarray(digits)
+    if digits.ndim != 2 or digits.shape[1] > 23:
+        raise ValueError(f"Expected an (n, lod) matrix with lod <= 23, not {digits.shape}.")
+    if digits.size and (digits.min() < 0 or digits.max() > 3):
+        raise ValueError("Path digits outside 0..3 are not permitted.")
+    shifts = _U64(2) * np.arange(22, 22 - digits.shape[1], -1, dtype=_U64)
+    return np.bitwise_or.reduce(digits.astype(_U64) << shifts, axis=1, initial=_U64(0)) if digits.shape[1] \
+        else np.zeros(digits.shape[0], dtype=_U64)
+
+
+# The path string form: the digits a face's LOD uses, coarsest first (eg "1203"), as build_path()
+# accepts them. LOD-0 faces have the empty string.
+_DIGIT_SHIFTS = _U64(2) * np.arange(22, -1, -1, dtype=_U64)
+
+
+def format_paths(face_ids: np.ndarray) -> np.ndarray:
+    '''
+    Returns the path string of each face, as a NumPy unicode array.
+    '''
+    face_ids = np.asarray(face_ids, dtype=_U64)
+    flat = face_ids.ravel()
+    lod = (flat >> _LOD_SHIFT).astype(np.int64)
+    codes = (((flat[:, None] >> _PATH_SHIFT) >> _DIGIT_SHIFTS) & _U64(0b11)).astype(np.uint32) + ord("0")
+    # Unicode arrays are NUL-padded UCS-4, so blanking the unused digits trims each string.
+    codes[np.arange(23) >= lod[:, None]] = 0
+    return np.ascontiguousarray(codes).view("<U23").reshape(face_ids.shape)
+
+
+def parse_paths(strings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Parses path strings, returning the LOD (the number of digits) and the left-aligned path of each.
+    '''
+    strings = np.asarray(strings, dtype=str)
+    if strings.size and np.char.str_len(strings).max() > 23:
+        raise ValueError("Path strings hold at most 23 digits.")
+    flat = strings.astype("<U23").ravel()
+    codes = np.ascontiguousarray(flat).view(np.uint32).reshape(len(flat), 23)
+    used = codes != 0
+    lod = used.sum(axis=1)
+    if (used[:, 1:] & ~used[:, :-1]).any() or ((codes < ord("0")) | (codes > ord("3")))[used].any():
+        raise ValueError("Path strings may only hold the digits 0..3.")
+    digits = np.where(used, codes - ord("0"), 0).astype(_U64)
+    paths = np.bitwise_or.reduce(digits << _DIGIT_SHIFTS, axis=1)
+    return lod.astype(np.uint8).reshape(strings.shape), paths.reshape(strings.shape)
+
+
+# <--------------------curve--------------------->
+def _step_curve(table: np.ndarray, state: np.ndarray, bits: np.ndarray, max_lod: int) -> np.ndarray:
+    # Runs the path digits or ranks in 'bits' (as in a FaceIdx) through a curve.py table, a byte at
+    # a time, and returns the result in the same place. Only the bytes that max_lod uses are run.
+    bits = bits >> _U64(6)
+    result = np.zeros(bits.shape, dtype=_U64)
+    for shift in _BYTE_SHIFTS[:(max_lod + 3) >> 2]:
+        step = table[(state << _U64(8)) | ((bits >> _U64(shift)) & _U64(0xFF))]
+        result |= (step >> _U64(4)) << _U64(shift)
+        state = step & _U64(0b1111)
+    return result << _U64(6)
+
+
+def curve_keys(face_ids: np.ndarray) -> np.ndarray:
+    '''
+    Array version of curve.curve_key().
+    '''
+    face_ids = np.asarray(face_ids, dtype=_U64)
+    lod = face_ids >> _LOD_SHIFT
+    d20 = (face_ids >> _D20_SHIFT) & _FIELD_MASK
+    if lod.size and (lod.max() >= 23 or d20.max() >= 20):
+        raise ValueError("LODs outside 0..22 and d20 faces outside 0..19 are not permitted.")
+    path_bits = _LOD_PATH_BITS[lod]
+    ranks = _step_curve(_CURVE_STEP_ARRAY, _CURVE_STATE[d20], face_ids & path_bits,
+                        int(lod.max(initial=0))) & path_bits
+    return np.asarray((lod << _LOD_SHIFT) | (_CURVE_POS[d20] << _D20_SHIFT) | ranks, dtype=_U64)
+
+
+def from_curve_keys(keys: np.ndarray) -> np.ndarray:
+    '''
+    Array version of curve.from_curve_key().
+    '''
+    keys = np.asarray(keys, dtype=_U64)
+    lod = keys >> _LOD_SHIFT
+    pos = (keys >> _D20_SHIFT) & _FIELD_MASK
+    if lod.size and (lod.max() >= 23 or pos.max() >= 20):
+        raise ValueError("Not valid curve keys.")
+    path_bits = _LOD_PATH_BITS[lod]
+    d20 = _CURVE_D20[pos]
+    digits = _step_curve(_CURVE_UNSTEP_ARRAY, _CURVE_START[pos], keys & path_bits,
+                         int(lod.max(initial=0))) & path_bits
+    south = _BASE_SOUTH[d20] ^ _parity_of_threes(digits)
+    return np.asarray((lod << _LOD_SHIFT) | (d20 << _D20_SHIFT) | digits | south, dtype=_U64)
+
+
+# <--------------------enumeration--------------------->
+CELL_ORDERS = ("path", "curve")
+
+
+def iter_cells(lod: int, root: Optional[int] = None, chunk_size: int = 1 << 20,
+               order: str = "path") -> Iterator[np.ndarray]:
+    '''
+    Yields every face at the given LOD, over the whole globe or under the given root face, as uint64
+    arrays of at most chunk_size faces. Nothing is built up front, so memory stays at one chunk
+    however many faces there are (eg, 335M at LOD 12).
+
+    The order is one of CELL_ORDERS:
+        "path"      FaceIdx order: d20 face, then path. Each subtree is one contiguous run, so
+                    nearby runs are nearby on the globe (a Z-order-like curve).
+        "curve"     Along the triangle curve of delta20.curve, so each face touches the next one
+                    (and the last touches the first, over the whole globe).
+    A chunk never spans two d20 faces.
+    '''
+    if lod < 0 or lod >= 23:
+        raise ValueError(f"LODs outside 0..22 are not permitted ({lod}).")
+    if order not in CELL_ORDERS:
+        raise ValueError(f"Unknown order '{order}' (expected one of {CELL_ORDERS}).")
+    if chunk_size < 1:
+        raise ValueError(f"The chunk size must be positive ({chunk_size}).")
+    if root is None:
+        roots = [d20 << 54 for d20 in (_CURVE_D20.tolist() if order == "curve" else range(20))]
+    else:
+        root_lod, root_d20 = root >> 59, (root >> 54) & 0b11111
+        if root_lod > lod or root_d20 >= 20:
+            raise ValueError(f"Not a root at or above LOD {lod} ({root:#x}).")
+        roots = [root]
+
+    shift = _U64(8 + 2 * (23 - lod))
+    for face_idx in roots:
+        root_lod = face_idx >> 59
+        # Below the root's digits (or ranks, along the curve), the faces simply count up through the
+        # remaining digits.
+        base_south = _BASE_SOUTH[(face_idx >> 54) & 0b11111]
+        if order == "curve":
+            face_idx = curve_key(face_idx)
+        header = _U64((lod << 59) | (face_idx & ((0b11111 << 54) | _lod_path_bits[root_lod])))
+        count = 1 << (2 * (lod - root_lod))
+        for start in range(0, count, chunk_size):
+            faces = (np.arange(start, min(start + chunk_size, count), dtype=_U64) << shift) | header
+            if order == "curve":
+                yield from_curve_keys(faces)
+            else:
+                yield faces | (base_south ^ _parity_of_threes(faces & _LOD_PATH_BITS[lod]))
+
+
+__all__ = ["CELL_ORDERS", "FACE_IDX_DTYPE", "build_paths", "curve_keys", "find_neighbors_batch", "format_paths",
+           "from_curve_keys", "from_range_keys", "iter_cells", "locate_many", "pack_many", "parse_paths",
+           "to_range_keys", "unpack_many"]
@@ -0,0 +1,200 @@
+'''
+A binary file format for large, sorted arrays of FaceIdx with fixed-width payload columns, read
+through mmap so that opening is instant and a query only pages in what it touches. Like
+delta20.batch, this needs NumPy.
+
+Layout (little-endian):
+    header      magic b"D20CELLS", version (u32), column count (u32), row count (u64)
+    columns     per column: name (32 bytes, UTF-8, NUL-padded), NumPy dtype string (16 bytes,
+                NUL-padded), data offset from the start of the file (u64)
+    data        each column's rows, back to back, starting on a 64-byte boundary
+The first column is always "face_idx", as '<u8', sorted ascending with no repeats.
+'''
+from __future__ import annotations
+import mmap
+import struct
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from delta20.defs import FaceIdx
+
+MAGIC = b"D20CELLS"
+VERSION = 1
+KEY_COLUMN = "face_idx"
+
+_HEADER = struct.Struct("<8sIIQ")
+_COLUMN = struct.Struct("<32s16sQ")
+_ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def write_cells(path: str, face_ids: np.ndarray, columns: Optional[Mapping[str, np.ndarray]] = None) -> None:
+    '''
+    Writes the faces, and a row of each payload column per face, to a cell file. The faces do not
+    need to be sorted (the rows are sorted along with them), but must not repeat. Columns must be
+    1-D arrays of a fixed-width dtype, as long as face_ids.
+    '''
+    keys = np.asarray(face_ids, dtype=np.uint64).ravel()
+    columns = dict(columns or {})
+    if KEY_COLUMN in columns:
+        raise ValueError(f"'{KEY_COLUMN}' is reserved for the key column.")
+
+    # Step #1 - validate the columns, in their on-disk (little-endian) form.
+    data: Dict[str, np.ndarray] = {KEY_COLUMN: keys.astype("<u8", copy=False)}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if values.ndim != 1 or len(values) != len(keys):
+            raise ValueError(f"Column '{name}' must be 1-D with {len(keys)} rows, not {values.shape}.")
+        if values.dtype.hasobject or values.dtype.fields is not None or values.dtype.itemsize == 0:
+            raise ValueError(f"Column '{name}' does not have a fixed-width dtype ({values.dtype}).")
+        if len(name.encode("utf-8")) > 32:
+            raise ValueError(f"Column names are limited to 32 bytes ('{name}').")
+        data[name] = values.astype(values.dtype.newbyteorder("<"), copy=False)
+
+    # Step #2 - sort the rows by key, unless they already are.
+    if len(keys) > 1 and not np.all(keys[1:] > keys[:-1]):
+        order = np.argsort(keys, kind="stable")
+        data = {name: values[order] for name, values in data.items()}
+        sorted_keys = data[KEY_COLUMN]
+        if np.any(sorted_keys[1:] == sorted_keys[:-1]):
+            raise ValueError("Faces must not repeat.")
+
+    # Step #3 - lay out and write.
+    offsets = []
+    end = _HEADER.size + _COLUMN.size * len(data)
+    for values in data.values():
+        offsets.append(_align(end))
+        end = offsets[-1] + values.nbytes
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(data), len(keys)))
+        for (name, values), offset in zip(data.items(), offsets):
+            f.write(_COLUMN.pack(name.encode("utf-8"), values.dtype.str.encode("ascii"), offset))
+        for values, offset in zip(data.values(), offsets):
+            f.seek(offset)
+            values.tofile(f)
+        f.truncate(end)
+
+
+class CellFile:
+    '''
+    A cell file, mapped into memory. The key column and the payload columns are read-only NumPy
+    views straight onto the mapping, so nothing is read from disk until it is touched. Close the
+    file (or use it as a context manager) once done with it; views still held keep the mapping
+    alive until they are dropped.
+    '''
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # (Empty files cannot be mapped.)
+            self._file.close()
+            raise ValueError(f"'{path}' is not a cell file.") from None
+        try:
+            layout, rows = self._read_layout(path)
+        except Exception:
+            self._mmap.close()
+            self._file.close()
+            raise
+        self._columns = {name: np.frombuffer(self._mmap, dtype=dtype, count=rows, offset=offset)
+                         for name, dtype, offset in layout}
+        self._keys = self._columns.pop(KEY_COLUMN)
+
+    def _read_layout(self, path: str) -> Tuple[List[Tuple[str, np.dtype, int]], int]:
+        '''
+        Returns the (name, dtype, offset) of each column, and the row count, checking that they fit
+        the file. No views are taken yet, so a bad file can still be unmapped.
+        '''
+        size = len(self._mmap)
+        if size < _HEADER.size:
+            raise ValueError(f"'{path}' is not a cell file.")
+        magic, version, column_count, rows = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a cell file.")
+        if version != VERSION:
+            raise ValueError(f"'{path}' has an unsupported version ({version}).")
+        if size < _HEADER.size + _COLUMN.size * column_count:
+            raise ValueError(f"'{path}' is truncated.")
+        layout = []
+        for i in range(column_count):
+            name, dtype_str, offset = _COLUMN.unpack_from(self._mmap, _HEADER.size + _COLUMN.size * i)
+            try:
+                dtype = np.dtype(dtype_str.rstrip(b"\0").decode("ascii"))
+            except (TypeError, UnicodeDecodeError):
+                raise ValueError(
+                    f"'{path}' has a column of unknown type ({dtype_str!r}).") from None
+            if offset + rows * dtype.itemsize > size:
+                raise ValueError(f"'{path}' is truncated.")
+            layout.append((name.rstrip(b"\0").decode("utf-8"), dtype, offset))
+        if not layout or layout[0][0] != KEY_COLUMN or layout[0][1] != np.dtype("<u8"):
+            raise ValueError(f"'{path}' has no key column.")
+        return layout, rows
+
+    def close(self) -> None:
+        '''
+        Unmaps the file, or, if views taken from it are still held, leaves that to the garbage
+        collector once they are dropped.
+        '''
+        self._columns.clear()
+        del self._keys
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self) -> CellFile:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def keys(self) -> np.ndarray:
+        '''The sorted FaceIdx column.'''
+        return self._keys
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        '''The payload columns, by name.'''
+        return dict(self._columns)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def find(self, face_ids: Union[FaceIdx, np.ndarray]) -> Union[int, np.ndarray]:
+        '''
+        Returns the row of each given face, or -1 where the file does not have it. A binary search
+        touches only O(log n) pages of the key column.
+        '''
+        keys = np.atleast_1d(np.asarray(face_ids, dtype=np.uint64))
+        result = np.full(keys.shape, -1, dtype=np.int64)
+        if len(self._keys):
+            rows = np.searchsorted(self._keys, keys)
+            found = np.minimum(rows, len(self._keys) - 1)
+            hit = self._keys[found] == keys
+            result[hit] = rows[hit]
+        return int(result[0]) if np.ndim(face_ids) == 0 else result.reshape(np.shape(face_ids))
+
+    def get(self, face_idx: FaceIdx) -> Optional[Dict[str, object]]:
+        '''
+        Returns the payload of the given face, by column name, or None if the file does not have it.
+        '''
+        row = self.find(face_idx)
+        if row < 0:
+            return None
+        return {name: values[row] for name, values in self._columns.items()}
+
+
+__all__ = ["CellFile", "write_cells"]
@@ -0,0 +1,205 @@
+'''
+CellUnion: a compact, normalized set of faces at mixed LODs. Like delta20.batch, this needs NumPy.
+'''
+from __future__ import annotations
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+
+from delta20.batch import from_range_keys, to_range_keys
+from delta20.defs import FaceIdx
+
+_U64 = np.uint64
+# The terminator bit of a LOD-0 range key. LOD-0 faces have no parent to merge into.
+_LOD0_TERMINATOR = _U64(1 << 58)
+
+
+def _terminators(keys: np.ndarray) -> np.ndarray:
+    return keys & (~keys + _U64(1))
+
+
+def _normalize(keys: np.ndarray) -> np.ndarray:
+    '''
+    Returns the normalized, sorted form of an array of range keys: no face covered by another, and
+    no four siblings without their parent.
+    '''
+    keys = np.sort(keys, kind="stable")
+    if keys.size == 0:
+        return keys
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+    # Step #1 - drop the faces that another face covers. Ordered by range start, and widest first
+    # on ties, a face is covered exactly when an earlier face's range reaches past its end. What
+    # remains is disjoint, so it is also sorted by key.
+    terminators = _terminators(keys)
+    mins, maxs = keys - (terminators - _U64(1)), keys + (terminators - _U64(1))
+    order = np.lexsort((~maxs, mins))
+    keys, maxs = keys[order], maxs[order]
+    covered = np.zeros(keys.size, dtype=bool)
+    covered[1:] = maxs[1:] <= np.maximum.accumulate(maxs)[:-1]
+    keys = keys[~covered]
+
+    # Step #2 - merge complete sibling sets into their parents, until there are none. Siblings are
+    # adjacent in sorted order, and four disjoint faces at one LOD with one parent are exactly its
+    # four children.
+    while keys.size >= 4:
+        terminators = _terminators(keys)
+        parent_terminators = terminators << _U64(2)
+        parents = (keys & (~parent_terminators + _U64(1))) | parent_terminators
+        complete = (terminators[:-3] < _LOD0_TERMINATOR) & (terminators[:-3] == terminators[3:])
+        for k in (1, 2, 3):
+            complete &= parents[:-3] == parents[k:keys.size - 3 + k]
+        starts = np.flatnonzero(complete)
+        if starts.size == 0:
+            break
+        merged = np.zeros(keys.size, dtype=bool)
+        for k in (1, 2, 3):
+            merged[starts + k] = True
+        keys = keys.copy()
+        keys[starts] = parents[starts]
+        keys = keys[~merged]
+    return keys
+
+
+class CellUnion:
+    '''
+    A set of faces, at any mix of LODs, stored as a sorted uint64 array of range keys (see
+    packing.to_range_key()). It is always normalized: no face is covered by another face in the set,
+    and four sibling faces are replaced by their parent. So two unions cover the same area exactly
+    when they are equal, and the storage is as compact as the area allows.
+
+    contains() and intersects() are binary searches. union(), intersection() and difference() are
+    merges or binary searches over the two sorted arrays.
+    '''
+    __slots__ = ("_keys", "_mins", "_maxs")
+
+    def __init__(self, cells: Union[Iterable[FaceIdx], np.ndarray] = ()):
+        if not isinstance(cells, np.ndarray):
+            cells = np.fromiter(cells, dtype=_U64)
+        self._set_keys(_normalize(to_range_keys(cells.ravel())))
+
+    @classmethod
+    def from_range_keys(cls, keys: np.ndarray) -> CellUnion:
+        '''
+        Returns the union of the faces with the given range keys.
+        '''
+        result = cls.__new__(cls)
+        result._set_keys(_normalize(np.asarray(keys, dtype=_U64).ravel()))
+        return result
+
+    def _set_keys(self, keys: np.ndarray) -> None:
+        terminators = _terminators(keys)
+        self._keys = keys
+        self._mins = keys - (terminators - _U64(1))
+        self._maxs = keys + (terminators - _U64(1))
+
+    @property
+    def range_keys(self) -> np.ndarray:
+        '''The sorted range keys of the faces. (Read only.)'''
+        view = self._keys.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def cells(self) -> np.ndarray:
+        '''The FaceIdx values of the faces, in range key order.'''
+        return from_range_keys(self._keys)
+
+    def __len__(self) -> int:
+        return int(self._keys.size)
+
+    def __iter__(self) -> Iterator[FaceIdx]:
+        return iter(self.cells.tolist())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CellUnion):
+            return NotImplemented
+        return bool(np.array_equal(self._keys, other._keys))
+
+    def __repr__(self) -> str:
+        return f"CellUnion({len(self)} faces)"
+
+    # <--------------------queries--------------------->
+    def _find(self, mins: np.ndarray) -> np.ndarray:
+        # The only stored face that can overlap a range starting at 'min' is the first one ending at
+        # or after it, since the stored ranges are disjoint and sorted.
+        return np.minimum(np.searchsorted(self._maxs, mins), max(self._keys.size - 1, 0))
+
+    def _contains_keys(self, keys: np.ndarray) -> np.ndarray:
+        if self._keys.size == 0:
+            return np.zeros(keys.shape, dtype=bool)
+        terminators = _terminators(keys)
+        mins, maxs = keys - (terminators - _U64(1)), keys + (terminators - _U64(1))
+        found = self._find(mins)
+        return np.asarray((self._mins[found] <= mins) & (self._maxs[found] >= maxs), dtype=bool)
+
+    def _intersects_keys(self, keys: np.ndarray) -> np.ndarray:
+        if self._keys.size == 0:
+            return np.zeros(keys.shape, dtype=bool)
+        terminators = _terminators(keys)
+        mins, maxs = keys - (terminators - _U64(1)), keys + (terminators - _U64(1))
+        found = self._find(mins)
+        return np.asarray((self._maxs[found] >= mins) & (self._mins[found] <= maxs), dtype=bool)
+
+    def contains(self, cells: Union[FaceIdx, np.ndarray]) -> Union[bool, np.ndarray]:
+        '''
+        Returns whether the union covers the whole of the given face. Given an array of faces,
+        returns an array of answers.
+        '''
+        keys = to_range_keys(np.atleast_1d(np.asarray(cells, dtype=_U64)))
+        result = self._contains_keys(keys)
+        return bool(result[0]) if np.ndim(cells) == 0 else result.reshape(np.shape(cells))
+
+    def intersects(self, cells: Union[FaceIdx, np.ndarray]) -> Union[bool, np.ndarray]:
+        '''
+        Returns whether the union covers any part of the given face. Given an array of faces,
+        returns an array of answers.
+        '''
+        keys = to_range_keys(np.atleast_1d(np.asarray(cells, dtype=_U64)))
+        result = self._intersects_keys(keys)
+        return bool(result[0]) if np.ndim(cells) == 0 else result.reshape(np.shape(cells))
+
+    def __contains__(self, face_idx: FaceIdx) -> bool:
+        return bool(self.contains(face_idx))
+
+    # <--------------------set operations--------------------->
+    def union(self, other: CellUnion) -> CellUnion:
+        '''
+        Returns the union of the two areas.
+        '''
+        return CellUnion.from_range_keys(np.concatenate((self._keys, other._keys)))
+
+    def intersection(self, other: CellUnion) -> CellUnion:
+        '''
+        Returns the area covered by both unions.
+        '''
+        # Any two faces either nest or are disjoint, so the overlap is made of whole faces from one
+        # side that the other side covers.
+        return CellUnion.from_range_keys(np.concatenate((self._keys[other._contains_keys(self._keys)],
+                                                         other._keys[self._contains_keys(other._keys)])))
+
+    def difference(self, other: CellUnion) -> CellUnion:
+        '''
+        Returns the area covered by this union but not the other.
+        '''
+        intersecting = other._intersects_keys(self._keys)
+        kept = [self._keys[~intersecting]]
+
+        # Faces that the other union only partly covers get split into their children, level by
+        # level, keeping the children it misses and dropping the ones it covers.
+        partial = self._keys[intersecting & ~other._contains_keys(self._keys)]
+        while partial.size:
+            quarter = _terminators(partial) >> _U64(2)
+            first = partial - (quarter << _U64(2)) + quarter
+            kids = (first[:, None] + (quarter << _U64(1))[:, None] * np.arange(4, dtype=_U64)).ravel()
+            intersecting = other._intersects_keys(kids)
+            kept.append(kids[~intersecting])
+            partial = kids[intersecting & ~other._contains_keys(kids)]
+        return CellUnion.from_range_keys(np.concatenate(kept))
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+
+__all__ = ["CellUnion"]
@@ -0,0 +1,330 @@
+'''
+Region coverings. A RegionCoverer approximates a region on the sphere with a small set of faces,
+either covering it (every point of the region is in some face) or inside it (every face is wholly in
+the region). The regions are spherical caps, latitude/longitude boxes and geodesic polygons.
+'''
+from __future__ import annotations
+import heapq
+from abc import ABC, abstractmethod
+from math import cos, pi, sin, sqrt
+from typing import List, Sequence, Tuple
+
+from delta20.defs import FaceIdx
+from delta20.geometry import get_cross_product, get_dot_product, get_face_vertices, get_lat_long, get_normalized
+from delta20.packing import children, pack_face_idx, unpack_face_idx
+
+Vector = Tuple[float, float, float]
+
+
+def _triangle_contains(a: Vector, b: Vector, c: Vector, p: Vector) -> bool:
+    '''
+    Returns whether the CCW triangle (a, b, c) contains the point p, boundary included.
+    '''
+    return get_dot_product(p, get_cross_product(a, b, normalize=False)) >= 0.0 \
+        and get_dot_product(p, get_cross_product(b, c, normalize=False)) >= 0.0 \
+        and get_dot_product(p, get_cross_product(c, a, normalize=False)) >= 0.0
+
+
+def _arcs_cross(a: Vector, b: Vector, c: Vector, d: Vector) -> bool:
+    '''
+    Returns whether the (shorter than a half circle) arcs a-b and c-d cross at a point interior to
+    both.
+    '''
+    ab = get_cross_product(a, b, normalize=False)
+    acb, bda = -get_dot_product(ab, c), get_dot_product(ab, d)
+    if acb * bda <= 0.0:
+        return False
+    cd = get_cross_product(c, d, normalize=False)
+    cbd, dac = -get_dot_product(cd, b), get_dot_product(cd, a)
+    return acb * cbd > 0.0 and acb * dac > 0.0
+
+
+def _arc_distance_cos(p: Vector, a: Vector, b: Vector) -> float:
+    '''
+    Returns the cosine of the angular distance from p to the nearest point of the arc a-b.
+    '''
+    best = max(get_dot_product(p, a), get_dot_product(p, b))
+    n = get_cross_product(a, b, normalize=False)
+    nn = get_dot_product(n, n)
+    if nn == 0.0:
+        return best
+    # The nearest point of the whole great circle is p's projection onto its plane. It only counts
+    # if it falls between a and b.
+    pn = get_dot_product(p, n) / nn
+    q = (p[0] - pn * n[0], p[1] - pn * n[1], p[2] - pn * n[2])
+    if get_dot_product(get_cross_product(a, q, normalize=False), n) > 0.0 \
+            and get_dot_product(get_cross_product(q, b, normalize=False), n) > 0.0:
+        best = max(best, sqrt(max(0.0, 1.0 - pn * pn * nn)))
+    return best
+
+
+# <--------------------regions--------------------->
+class Region(ABC):
+    '''
+    The interface a RegionCoverer needs from a region. Triangles are given by their CCW corner unit
+    vectors. intersects_triangle() may err towards True, and contains_triangle() towards False: the
+    coverings stay correct, just less tight.
+    '''
+
+    @abstractmethod
+    def contains_point(self, p: Vector) -> bool:
+        ...
+
+    @abstractmethod
+    def contains_triangle(self, a: Vector, b: Vector, c: Vector) -> bool:
+        ...
+
+    @abstractmethod
+    def intersects_triangle(self, a: Vector, b: Vector, c: Vector) -> bool:
+        ...
+
+
+class SphericalCap(Region):
+    '''
+    The points within the given angle (in radians, 0..pi) of a center direction.
+    '''
+
+    def __init__(self, center: Vector, angle: float):
+        if not 0.0 <= angle <= pi:
+            raise ValueError(f"Cap angles outside 0..pi are not permitted ({angle}).")
+        self.center = get_normalized(*center)
+        self.angle = angle
+        self._cos = cos(angle)
+
+    def contains_point(self, p: Vector) -> bool:
+        return get_dot_product(self.center, p) >= self._cos
+
+    def contains_triangle(self, a: Vector, b: Vector, c: Vector) -> bool:
+        if self.angle <= pi / 2:
+            # A cap no bigger than a hemisphere is convex, so it contains the triangle when it
+            # contains the corners.
+            return self.contains_point(a) and self.contains_point(b) and self.contains_point(c)
+        # A bigger cap contains the triangle when its (convex) complement misses it.
+        return not SphericalCap((-self.center[0], -self.center[1], -self.center[2]),
+                                pi - self.angle).intersects_triangle(a, b, c)
+
+    def intersects_triangle(self, a: Vector, b: Vector, c: Vector) -> bool:
+        if self.angle > pi / 2:
+            return not SphericalCap((-self.center[0], -self.center[1], -self.center[2]),
+                                    pi - self.angle).contains_triangle(a, b, c)
+        if _triangle_contains(a, b, c, self.center):
+            return True
+        return max(_arc_distance_cos(self.center, a, b), _arc_distance_cos(self.center, b, c),
+                   _arc_distance_cos(self.center, c, a)) >= self._cos
+
+
+class LatLonRect(Region):
+    '''
+    The points with latitude in [lat_lo, lat_hi] and longitude in [lon_lo, lon_hi], in radians (see
+    geometry.get_lat_long()). If lon_lo > lon_hi, the box crosses the antimeridian. A longitude span
+    of 2*pi or more covers every longitude.
+    '''
+
+    def __init__(self, lat_lo: float, lon_lo: float, lat_hi: float, lon_hi: float):
+        if not -pi / 2 <= lat_lo <= lat_hi <= pi / 2:
+            raise ValueError(f"Not a valid latitude range ({lat_lo}, {lat_hi}).")
+        self.lat_lo, self.lon_lo, self.lat_hi, self.lon_hi = lat_lo, lon_lo, lat_hi, lon_hi
+        self._y_lo, self._y_hi = sin(lat_lo), sin(lat_hi)
+        self._lon_full = lon_hi - lon_lo >= 2 * pi
+        self._lon_width = (lon_hi - lon_lo) % (2 * pi)
+
+    def _lon_contains(self, lon: float) -> bool:
+        return self._lon_full or (lon - self.lon_lo) % (2 * pi) <= self._lon_width
+
+    def contains_point(self, p: Vector) -> bool:
+        lat, lon = get_lat_long(*p)
+        return self._y_lo <= p[1] <= self._y_hi and (abs(lat) == pi / 2 or self._lon_contains(lon))
+
+    def _get_triangle_bound(self, a: Vector, b: Vector, c: Vector) -> Tuple[float, float, float, float, bool]:
+        '''
+        Returns the range of y (the sine of the latitude) over the triangle, and its longitude range
+        as (start, width, is_full).
+        '''
+        y_lo, y_hi = min(a[1], b[1], c[1]), max(a[1], b[1], c[1])
+        # Geodesic edges bulge towards the poles. An edge reaches past its ends when the point of its
+        # great circle nearest a pole falls inside it.
+        for u, v in ((a, b), (b, c), (c, a)):
+            n = get_cross_product(u, v, normalize=False)
+            nn = get_dot_product(n, n)
+            if nn == 0.0:
+                continue
+            top = (-n[1] * n[0] / nn, 1.0 - n[1] * n[1] / nn, -n[1] * n[2] / nn)
+            extent = sqrt(max(0.0, top[1]))
+            for sign in (1.0, -1.0):
+                q = (sign * top[0], sign * top[1], sign * top[2])
+                if get_dot_product(get_cross_product(u, q, normalize=False), n) > 0.0 \
+                        and get_dot_product(get_cross_product(q, v, normalize=False), n) > 0.0:
+                    y_lo, y_hi = min(y_lo, sign * extent), max(y_hi, sign * extent)
+
+        # A triangle that touches a pole takes every longitude. Otherwise, each edge spans less than
+        # half a turn, so the longitudes are the smallest arc holding the corners.
+        north, south = _triangle_contains(a, b, c, (0.0, 1.0, 0.0)), _triangle_contains(a, b, c, (0.0, -1.0, 0.0))
+        if north or south:
+            return -1.0 if south else y_lo, 1.0 if north else y_hi, 0.0, 2 * pi, True
+        lons = sorted(get_lat_long(*v)[1] for v in (a, b, c))
+        gaps = [(lons[1] - lons[0], 1), (lons[2] - lons[1], 2), (lons[0] + 2 * pi - lons[2], 0)]
+        gap, start = max(gaps)
+        return y_lo, y_hi, lons[start], 2 * pi - gap, False
+
+    def contains_triangle(self, a: Vector, b: Vector, c: Vector) -> bool:
+        y_lo, y_hi, lon, width, full = self._get_triangle_bound(a, b, c)
+        if y_lo < self._y_lo or y_hi > self._y_hi:
+            return False
+        if self._lon_full:
+            return True
+        return not full and (lon - self.lon_lo) % (2 * pi) + width <= self._lon_width
+
+    def intersects_triangle(self, a: Vector, b: Vector, c: Vector) -> bool:
+        y_lo, y_hi, lon, width, full = self._get_triangle_bound(a, b, c)
+        if y_hi < self._y_lo or y_lo > self._y_hi:
+            return False
+        if self._lon_full or full:
+            return True
+        return (lon - self.lon_lo) % (2 * pi) <= self._lon_width or (self.lon_lo - lon) % (2 * pi) <= width
+
+
+class Polygon(Region):
+    '''
+    A simple polygon with geodesic edges, given by its corner directions in CCW order (seen from
+    outside the sphere). It must fit inside a hemisphere.
+    '''
+
+    def __init__(self, vertices: Sequence[Vector]):
+        if len(vertices) < 3:
+            raise ValueError(f"A polygon needs at least 3 vertices ({len(vertices)}).")
+        self.vertices = tuple(get_normalized(*v) for v in vertices)
+        self.edges = tuple(zip(self.vertices, self.vertices[1:] + self.vertices[:1]))
+
+        # Within a hemisphere, the gnomonic projection onto the plane tangent at its center turns
+        # the geodesic edges into straight lines, so points can be tested in the plane.
+        sx, sy, sz = 0.0, 0.0, 0.0
+        for x, y, z in self.vertices:
+            sx, sy, sz = sx + x, sy + y, sz + z
+        total = (sx, sy, sz)
+        if get_dot_product(total, total) < 1e-24:
+            raise ValueError("The polygon does not fit inside a hemisphere.")
+        self._center = get_normalized(*total)
+        if any(get_dot_product(self._center, v) <= 0.0 for v in self.vertices):
+            raise ValueError("The polygon does not fit inside a hemisphere.")
+        helper = (1.0, 0.0, 0.0) if abs(self._center[0]) < 0.9 else (0.0, 1.0, 0.0)
+        self._e1 = get_cross_product(self._center, helper)
+        self._e2 = get_cross_product(self._center, self._e1)
+        self._projected = tuple(self._project(v) for v in self.vertices)
+
+    def _project(self, p: Vector) -> Tuple[float, float]:
+        d = get_dot_product(p, self._center)
+        return get_dot_product(p, self._e1) / d, get_dot_product(p, self._e2) / d
+
+    def contains_point(self, p: Vector) -> bool:
+        if get_dot_product(p, self._center) <= 0.0:
+            return False
+        x, y = self._project(p)
+        inside = False
+        for (x0, y0), (x1, y1) in zip(self._projected, self._projected[1:] + self._projected[:1]):
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                inside = not inside
+        return inside
+
+    def _boundaries_cross(self, a: Vector, b: Vector, c: Vector) -> bool:
+        return any(_arcs_cross(u, v, p, q) for u, v in ((a, b), (b, c), (c, a)) for p, q in self.edges)
+
+    def contains_triangle(self, a: Vector, b: Vector, c: Vector) -> bool:
+        return self.contains_point(a) and self.contains_point(b) and self.contains_point(c) \
+            and not any(_triangle_contains(a, b, c, v) for v in self.vertices) \
+            and not self._boundaries_cross(a, b, c)
+
+    def intersects_triangle(self, a: Vector, b: Vector, c: Vector) -> bool:
+        return self.contains_point(a) or self.contains_point(b) or self.contains_point(c) \
+            or any(_triangle_contains(a, b, c, v) for v in self.vertices) \
+            or self._boundaries_cross(a, b, c)
+
+
+# <--------------------coverer--------------------->
+class RegionCoverer:
+    '''
+    Approximates regions with faces between min_lod and max_lod, aiming for at most max_cells faces.
+    The search starts from the d20 faces and keeps splitting the biggest faces that straddle the
+    region's boundary, as long as the budget allows. The faces in a result never overlap, and come
+    sorted.
+
+    A covering can exceed max_cells when min_lod forces more faces, or when the region touches more
+    d20 faces than the budget.
+    '''
+
+    def __init__(self, min_lod: int = 0, max_lod: int = 22, max_cells: int = 8):
+        if not 0 <= min_lod <= max_lod <= 22:
+            raise ValueError(f"Not a valid LOD range ({min_lod}, {max_lod}).")
+        if max_cells < 1:
+            raise ValueError(f"max_cells must be at least 1 ({max_cells}).")
+        self.min_lod, self.max_lod, self.max_cells = min_lod, max_lod, max_cells
+
+    def _get_children(self, region: Region, face_idx: FaceIdx, interior: bool) -> List[Tuple[FaceIdx, bool]]:
+        '''
+        Returns the children of the face worth keeping, each with whether it is terminal (needs no
+        further splitting).
+        '''
+        result = []
+        for child in children(face_idx):
+            a, b, c = get_face_vertices(child)
+            if not region.intersects_triangle(a, b, c):
+                continue
+            lod = unpack_face_idx(child)[0]
+            contained = region.contains_triangle(a, b, c)
+            if interior and lod == self.max_lod and not contained:
+                continue
+            result.append((child, lod >= self.min_lod and (contained or lod == self.max_lod)))
+        return result
+
+    def _cover(self, region: Region, interior: bool) -> List[FaceIdx]:
+        result: List[FaceIdx] = []
+        # Queue entries are (lod, number of children to add, face, children). Coarse faces come
+        # first, and among those, the ones that cost the least to split.
+        queue: List[Tuple[int, int, FaceIdx, List[Tuple[FaceIdx, bool]]]] = []
+
+        def add(face_idx: FaceIdx, is_terminal: bool) -> None:
+            lod = unpack_face_idx(face_idx)[0]
+            if is_terminal:
+                result.append(face_idx)
+                return
+            kids = self._get_children(region, face_idx, interior)
+            # A face whose whole area comes back as terminal children is as good as the children.
+            if len(kids) == 4 and all(t for _, t in kids) and lod >= self.min_lod and not interior:
+                result.append(face_idx)
+            elif kids:
+                heapq.heappush(queue, (lod, len(kids), face_idx, kids))
+
+        for d20 in range(20):
+            face = pack_face_idx(0, d20, 0)
+            a, b, c = get_face_vertices(face)
+            if not region.intersects_triangle(a, b, c):
+                continue
+            contained = region.contains_triangle(a, b, c)
+            if interior and self.max_lod == 0 and not contained:
+                continue
+            add(face, self.min_lod == 0 and (contained or self.max_lod == 0))
+
+        while queue and (not interior or len(result) < self.max_cells):
+            lod, count, face, kids = heapq.heappop(queue)
+            if lod < self.min_lod or len(result) + len(queue) + count <= self.max_cells:
+                for child, is_terminal in kids:
+                    add(child, is_terminal)
+            elif not interior:
+                # Out of budget: the face stays whole. (An interior covering drops it, since it
+                # straddles the boundary.)
+                result.append(face)
+        return sorted(result)
+
+    def get_covering(self, region: Region) -> List[FaceIdx]:
+        '''
+        Returns faces whose union contains the region.
+        '''
+        return self._cover(region, interior=False)
+
+    def get_interior_covering(self, region: Region) -> List[FaceIdx]:
+        '''
+        Returns faces that each lie wholly inside the region.
+        '''
+        return self._cover(region, interior=True)
+
+
+__all__ = ["LatLonRect", "Polygon", "Region", "RegionCoverer", "SphericalCap"]
@@ -0,0 +1,113 @@
+'''
+A continuous space-filling curve through the faces at each LOD (a Sierpiński-style triangle curve),
+for laying out per-face data so that faces next to each other in memory are next to each other on
+the globe.
+
+FaceIdx order visits the center child (3) after the corner children, and jumps between corners, so
+consecutive faces are often far apart. The curve instead enters each face at one corner and leaves
+at another, and visits the four children so that each one is left where the next is entered:
+
+    entering at corner en, leaving at corner ex, with t the third corner:
+        child en    entered at V(en), left at M(en,t)       (the midpoint of edge en-t)
+        child t     entered at M(en,t), left at M(t,ex)
+        child 3     entered at M(t,ex), left at M(en,ex)
+        child ex    entered at M(en,ex), left at V(ex)
+
+The corner children keep their parent's corner numbers, and the center child's corner k is the
+midpoint opposite the parent's corner k (see CONVENTIONS.md), so every child is entered at its own
+corner en, and left at t (children en and 3) or ex (children t and ex). The d20 faces are chained in
+a loop, each entered where the previous one was left, and sharing an edge with it (see
+tools/build_curve_chain.py).
+
+A curve key packs like a FaceIdx, with the position in the d20 chain in place of the d20 face, the
+position among the siblings (0..3) in place of each path digit, and no polarity:
+        lod        chain      ranks (MSD)     (zero)
+     (5 bits) | (5 bits) |    (46 bits)   | (8 bits)
+So at any one LOD, sorting by curve key is sorting along the curve, and the faces under any face are
+one contiguous run of keys.
+'''
+from __future__ import annotations
+from typing import Final, List, Tuple
+
+from delta20.defs import FaceIdx
+from delta20.packing import _lod_path_bits, pack_face_idx
+
+# The d20 faces in curve order, as (d20, corner entered, corner left).
+_D20_CURVE: Final = ((0, 0, 1), (4, 2, 0), (3, 0, 1), (2, 2, 1), (10, 2, 0), (9, 2, 1), (16, 2, 0),
+                     (15, 0, 2), (19, 1, 0), (18, 0, 2), (17, 1, 2), (11, 1, 0), (12, 2, 0), (13, 1, 0),
+                     (14, 2, 0), (5, 1, 0), (6, 2, 0), (7, 1, 0), (8, 2, 1), (1, 2, 0))
+# The position of each d20 face in the chain, and the state (see below) the curve enters it in.
+_D20_CURVE_POS: Final = tuple(next(i for i, (d20, _, _) in enumerate(_D20_CURVE) if d20 == face)
+                              for face in range(20))
+_D20_CURVE_STATE: Final = tuple(3 * _D20_CURVE[pos][1] + _D20_CURVE[pos][2] for pos in _D20_CURVE_POS)
+
+
+def _build_step_tables() -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    '''
+    Returns the tables that step the curve 4 digits (a byte) at a time. A state is 3 * en + ex. Both
+    tables are indexed by (state << 8) | byte; _CURVE_STEP maps path digits to ranks, and
+    _CURVE_UNSTEP ranks to path digits, each entry holding (byte << 4) | the next state.
+    '''
+    step: List[int] = [0] * (9 << 8)
+    unstep: List[int] = [0] * (9 << 8)
+    for en in range(3):
+        for ex in range(3):
+            if en == ex:
+                continue
+            for byte in range(256):
+                state, ranks = 3 * en + ex, 0
+                for shift in (6, 4, 2, 0):
+                    digit = (byte >> shift) & 0b11
+                    t = 3 - en - state % 3
+                    order = (en, t, 3, state % 3)
+                    ranks = (ranks << 2) | order.index(digit)
+                    # Children en and 3 are left at t; children t and ex at ex.
+                    if digit == en or digit == 3:
+                        state = 3 * en + t
+                step[((3 * en + ex) << 8) | byte] = (ranks << 4) | state
+                unstep[((3 * en + ex) << 8) | ranks] = (byte << 4) | state
+    return tuple(step), tuple(unstep)
+
+
+_CURVE_STEP, _CURVE_UNSTEP = _build_step_tables()
+# The byte offsets of a path, shifted down by 6 bits to 48 bits (so 24 digits, the last always 0).
+# A LOD-n path only needs the first (n + 3) // 4 of them.
+_BYTE_SHIFTS: Final = (40, 32, 24, 16, 8, 0)
+
+
+def curve_key(face_idx: FaceIdx) -> int:
+    '''
+    Returns the position of the face along the curve at its LOD, as a curve key.
+    '''
+    lod = face_idx >> 59
+    d20 = (face_idx >> 54) & 0b11111
+    if lod >= 23 or d20 >= 20:
+        raise ValueError(f"Not a valid FaceIdx ({face_idx:#x}).")
+    digits = (face_idx & _lod_path_bits[lod]) >> 6
+    state, ranks = _D20_CURVE_STATE[d20], 0
+    for shift in _BYTE_SHIFTS[:(lod + 3) >> 2]:
+        step = _CURVE_STEP[(state << 8) | ((digits >> shift) & 0xFF)]
+        ranks |= (step >> 4) << shift
+        state = step & 0b1111
+    return (lod << 59) | (_D20_CURVE_POS[d20] << 54) | ((ranks << 6) & _lod_path_bits[lod])
+
+
+def from_curve_key(key: int) -> FaceIdx:
+    '''
+    Returns the face at the given curve key (the inverse of curve_key()).
+    '''
+    lod = key >> 59
+    pos = (key >> 54) & 0b11111
+    if lod >= 23 or pos >= 20:
+        raise ValueError(f"Not a valid curve key ({key:#x}).")
+    d20, entry, exit_corner = _D20_CURVE[pos]
+    ranks = (key & _lod_path_bits[lod]) >> 6
+    state, digits = 3 * entry + exit_corner, 0
+    for shift in _BYTE_SHIFTS[:(lod + 3) >> 2]:
+        step = _CURVE_UNSTEP[(state << 8) | ((ranks >> shift) & 0xFF)]
+        digits |= (step >> 4) << shift
+        state = step & 0b1111
+    return pack_face_idx(lod, d20, ((digits << 6) & _lod_path_bits[lod]) >> 8)
+
+
+__all__ = ["curve_key", "from_curve_key"]
@@ -1,8 +1,10 @@
 from delta20.defs import VertexIdx
-from typing import Tuple
+from functools import lru_cache
+from typing import Tuple, Union
 from math import atan2, asin, cos, sin, sqrt, pi
-from delta20.defs import VertexIdx
-from delta20.precomputed.canonical_d20 import CANONICAL_VERTS
+from delta20.defs import VertexIdx, FaceIdx
+from delta20.packing import pack_face_idx, unpack_face_idx
+from delta20.precomputed.canonical_d20 import CANONICAL_VERTS, CANONICAL_FACES, CANONICAL_FACES_INDEXED
 
 N = 0
 NW = 1
@@ -18,7 +20,7 @@ def get_dot_product(u: Tuple[float, float, float], v: Tuple[float, float, float]
     return u[0] * v[0] + u[1] * v[1] + u[2] * v[2]
 
 
-def get_cross_product(a: Tuple[float, float, float], b: Tuple[float, float, float], normalize=True) -> Tuple[float, float, float]:
+def get_cross_product(a: Tuple[float, float, float], b: Tuple[float, float, float], normalize: bool = True) -> Tuple[float, float, float]:
     x = a[1] * b[2] - a[2] * b[1]
     y = a[2] * b[0] - a[0] * b[2]
     z = a[0] * b[1] - a[1] * b[0]
@@ -61,15 +63,20 @@ def get_shortest_arc(goal: Tuple[float, float, float],
     return az
 
 
-def get_face_center(face: Tuple[VertexIdx, VertexIdx, VertexIdx], normalize: bool = True) -> Tuple[float, float, float]:
+def get_face_center(face: Union[FaceIdx, Tuple[VertexIdx, VertexIdx, VertexIdx]],
+                    normalize: bool = True) -> Tuple[float, float, float]:
     '''
-    Returns a directional center for a face. Specifically, computes the mean direction of the 
-    three unit vertex vectors. Note: this is the chordal/Euclidean center, normalized to project 
-    back onto the unit sphere. It is not the spherical (surface-area) centroid of the geodesic 
-    triangle, but it’s stable, fast, and close for our faces.
+    Returns a directional center for a face, given either its FaceIdx (at any LOD) or a tuple of
+    the three VertexIdx keys of a d20 face in CANONICAL_VERTS. Specifically, computes the mean
+    direction of the three unit vertex vectors. Note: this is the chordal/Euclidean center,
+    normalized to project back onto the unit sphere. It is not the spherical (surface-area)
+    centroid of the geodesic triangle, but it’s stable, fast, and close for our faces.
     '''
     # fmt: off
-    v0, v1, v2 = CANONICAL_VERTS[face[0]], CANONICAL_VERTS[face[1]], CANONICAL_VERTS[face[2]]
+    if isinstance(face, tuple):
+        v0, v1, v2 = CANONICAL_VERTS[face[0]], CANONICAL_VERTS[face[1]], CANONICAL_VERTS[face[2]]
+    else:
+        v0, v1, v2 = get_face_vertices(face)
     # fmt: on
 
     x = (v0[0] + v1[0] + v2[0]) / 3.0
@@ -80,7 +87,7 @@ def get_face_center(face: Tuple[VertexIdx, VertexIdx, VertexIdx], normalize: boo
     return (x, y, z)
 
 
-def get_vector_length(x, y, z) -> float:
+def get_vector_length(x: float, y: float, z: float) -> float:
     return sqrt(x * x + y * y + z * z)
 
 
@@ -132,3 +139,155 @@ def get_vector(lat: float, lon: float) -> Tuple[float, float, float]:
     # tiny renormalization for numerical safety
     r = get_vector_length(x, y, z)
     return (x / r, y / r, z / r)
+
+
+def get_midpoint(u: Tuple[float, float, float], v: Tuple[float, float, float]) -> Tuple[float, float, float]:
+    '''
+    Returns the midpoint of the great-circle arc between two unit vectors, which is where a
+    triangle's edge is split when it is subdivided.
+    '''
+    return get_normalized(u[0] + v[0], u[1] + v[1], u[2] + v[2])
+
+
+# <--------------------point location--------------------->
+# The corners of each d20 face, as vectors, indexed by d20.
+_D20_VERTS = tuple(tuple(CANONICAL_VERTS[v] for v in CANONICAL_FACES[fi]) for fi in CANONICAL_FACES_INDEXED)
+
+# The face normals of the icosahedron. The face a point projects onto is the one whose normal has
+# the greatest dot product with it. The icosahedron is centrally symmetric, so the faces come in
+# antipodal pairs with opposite normals, and only one normal per pair needs testing: the sign of
+# its dot product picks the face from the pair. Each entry is (normal, d20, antipodal d20).
+def _build_face_normal_table() -> Tuple[Tuple[Tuple[float, float, float], int, int], ...]:
+    normals = [get_face_center(CANONICAL_FACES[fi]) for fi in CANONICAL_FACES_INDEXED]
+    table = []
+    for d20, n in enumerate(normals):
+        opposite = max(range(20), key=lambda other: -get_dot_product(n, normals[other]))
+        if d20 < opposite:
+            table.append((n, d20, opposite))
+    return tuple(table)
+
+
+_FACE_NORMALS = _build_face_normal_table()
+
+
+def locate(x: float, y: float, z: float, lod: int) -> FaceIdx:
+    '''
+    Returns the FaceIdx of the triangle at the given LOD that contains the direction (x, y, z). The
+    vector does not need to be unit length.
+    '''
+    if lod < 0 or lod >= 23:
+        raise ValueError(f"LODs outside 0..22 are not permitted ({lod}).")
+
+    # Step #1 - pick the d20 face from the face-normal table.
+    best, d20 = 0.0, -1
+    for n, face, opposite in _FACE_NORMALS:
+        dot = n[0] * x + n[1] * y + n[2] * z
+        if dot > best:
+            best, d20 = dot, face
+        elif -dot > best:
+            best, d20 = -dot, opposite
+    if d20 < 0:
+        raise ValueError("Cannot locate a zero vector.")
+
+    # Step #2 - descend. At each LOD, split the triangle at its edge midpoints and test the point
+    # against the planes through the origin and each pair of midpoints. Those planes are the inner
+    # edges of the corner children; a point on none of their inner sides is in the center child.
+    (ax, ay, az), (bx, by, bz), (cx, cy, cz) = _D20_VERTS[d20]
+    is_south = (CANONICAL_FACES_INDEXED[d20] & 0b1) == 0b1
+    path = 0
+    for _ in range(lod):
+        # (get_midpoint(), inlined)
+        m01x, m01y, m01z = ax + bx, ay + by, az + bz
+        r = 1.0 / sqrt(m01x * m01x + m01y * m01y + m01z * m01z)
+        m01x, m01y, m01z = m01x * r, m01y * r, m01z * r
+        m12x, m12y, m12z = bx + cx, by + cy, bz + cz
+        r = 1.0 / sqrt(m12x * m12x + m12y * m12y + m12z * m12z)
+        m12x, m12y, m12z = m12x * r, m12y * r, m12z * r
+        m20x, m20y, m20z = cx + ax, cy + ay, cz + az
+        r = 1.0 / sqrt(m20x * m20x + m20y * m20y + m20z * m20z)
+        m20x, m20y, m20z = m20x * r, m20y * r, m20z * r
+        path <<= 2
+        # Child 0 is (V0, M01, M20): is the point on V0's side of M01 -> M20?
+        if x * (m01y * m20z - m01z * m20y) + y * (m01z * m20x - m01x * m20z) \
+                + z * (m01x * m20y - m01y * m20x) > 0.0:
+            bx, by, bz = m01x, m01y, m01z
+            cx, cy, cz = m20x, m20y, m20z
+        # Child 1 is (M01, V1, M12): is the point on V1's side of M12 -> M01?
+        elif x * (m12y * m01z - m12z * m01y) + y * (m12z * m01x - m12x * m01z) \
+                + z * (m12x * m01y - m12y * m01x) > 0.0:
+            path |= 1
+            ax, ay, az = m01x, m01y, m01z
+            cx, cy, cz = m12x, m12y, m12z
+        # Child 2 is (M20, M12, V2): is the point on V2's side of M20 -> M12?
+        elif x * (m20y * m12z - m20z * m12y) + y * (m20z * m12x - m20x * m12z) \
+                + z * (m20x * m12y - m20y * m12x) > 0.0:
+            path |= 2
+            ax, ay, az = m20x, m20y, m20z
+            bx, by, bz = m12x, m12y, m12z
+        # Child 3 is the center, (M12, M20, M01), and has the opposite polarity.
+        else:
+            path |= 3
+            ax, ay, az = m12x, m12y, m12z
+            bx, by, bz = m20x, m20y, m20z
+            cx, cy, cz = m01x, m01y, m01z
+            is_south = not is_south
+
+    # Done.
+    return pack_face_idx(lod, d20, path << ((23 - lod) * 2), is_south)
+
+
+def locate_lat_long(lat: float, lon: float, lod: int) -> FaceIdx:
+    '''
+    Returns the FaceIdx of the triangle at the given LOD that contains the given latitude and
+    longitude, in radians (see get_vector()).
+    '''
+    return locate(*get_vector(lat, lon), lod)
+
+
+# <--------------------cell geometry--------------------->
+# How many ancestor triangles _get_triangle() keeps. A LOD-22 lookup touches at most 22 ancestors,
+# and neighboring cells share most of them, so this comfortably covers a working set of thousands
+# of cells.
+TRIANGLE_CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=TRIANGLE_CACHE_SIZE)
+def _get_triangle(d20: int, lod: int, digits: int) -> Tuple[Tuple[float, float, float], ...]:
+    '''
+    Returns the corners (V0, V1, V2) of the triangle with the given d20 face and LOD, whose path
+    digits are right-aligned in 'digits' (ie, the finest digit is digits & 0b11). The parent comes
+    from the cache whenever a sibling or cousin was looked up recently.
+    '''
+    if lod == 0:
+        return _D20_VERTS[d20]
+    a, b, c = _get_triangle(d20, lod - 1, digits >> 2)
+    pos = digits & 0b11
+    # Corner children keep their own corner and take the midpoints of the two adjacent edges. The
+    # center child is (M12, M20, M01): its V0 faces the parent's V0 across the parent's middle, so
+    # it has the opposite polarity.
+    if pos == 0:
+        return a, get_midpoint(a, b), get_midpoint(c, a)
+    if pos == 1:
+        return get_midpoint(a, b), b, get_midpoint(b, c)
+    if pos == 2:
+        return get_midpoint(c, a), get_midpoint(b, c), c
+    return get_midpoint(b, c), get_midpoint(c, a), get_midpoint(a, b)
+
+
+def get_face_vertices(face_idx: FaceIdx) -> Tuple[Tuple[float, float, float], ...]:
+    '''
+    Returns the unit vectors of the corners (V0, V1, V2) of the given face, at any LOD. The corners
+    are CCW, and V0 is the polar (north or south) corner, as laid out in CONVENTIONS.md.
+    '''
+    lod, d20, path, _ = unpack_face_idx(face_idx)
+    return _get_triangle(d20, lod, path >> ((23 - lod) * 2))
+
+
+def get_face_area(face_idx: FaceIdx) -> float:
+    '''
+    Returns the area of the given face's geodesic triangle on the unit sphere, in steradians.
+    '''
+    a, b, c = get_face_vertices(face_idx)
+    # The spherical excess, from tan(E/2) = |a . (b x c)| / (1 + a.b + b.c + c.a)
+    triple = abs(get_dot_product(a, get_cross_product(b, c, normalize=False)))
+    return 2.0 * atan2(triple, 1.0 + get_dot_product(a, b) + get_dot_product(b, c) + get_dot_product(c, a))
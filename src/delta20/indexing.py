@@ -1,8 +1,12 @@
 from __future__ import annotations
-from typing import Dict, Tuple, List, Mapping, Sequence, Callable
+from typing import Dict, Final, Tuple, List, Mapping, Sequence, Set, Callable
 
-from math import sqrt, hypot, atan2
-from delta20.packing import build_path, get_pos, pack_face_idx, unpack_face_idx, face_idx_to_str
+import heapq
+from functools import lru_cache
+from math import sqrt, hypot, atan2, inf
+from delta20.geometry import get_face_center
+from delta20.packing import _d20_mask, _digit_lo_bits, _lod_mask, _lod_path_bits
+from delta20.packing import ancestor, build_path, get_pos, pack_face_idx, unpack_face_idx, face_idx_to_str
 from delta20.precomputed.canonical_d20 import CANONICAL_FACES_INDEXED
 from delta20.precomputed.raw_d20 import raw_neighbors
 
@@ -13,25 +17,19 @@ FaceIdx = int
 VertexIdx = int
 
 
-def _get_nbr_chars(is_south: bool, pos: int, edge: int, copolar: bool) -> Tuple[bool, int, int]:
-    '''
-    Returns the is_south, pos, and return edge of the neighbor. Central triangle hops are ruled 
-    out already.
-    '''
-    assert edge >= 0 and edge <= 2
-    assert pos >= 0 and pos <= 3
-    if edge == 0:
-        return not is_south, 2 if pos == 1 else 1, 0
-    if edge == 1:
-        if copolar:
-            return is_south, 0 if pos == 0 else 1, 2
-        else:
-            return not is_south, 2 if pos == 0 else 0, 1
-    if edge == 2:
-        if copolar:
-            return is_south, 0 if pos == 0 else 2, 1
-        else:
-            return not is_south, 1 if pos == 0 else 0, 2
+# The digits are worked on where they sit in a FaceIdx, with packing's masks: _lod_path_bits[lod]
+# for the digits a LOD uses, and _digit_lo_bits for the low bit of every digit slot. _HEADER_MASK
+# keeps the LOD and d20 bits.
+_HEADER_MASK: Final = _lod_mask | _d20_mask
+# A digit replicated into every slot. _EDGE_DIGITS[e] finds digits equal to the edge.
+# XOR-ing against _EDGE_REFLECT[e] swaps the two corner children along edge e, and swaps 3 <-> e.
+_EDGE_DIGITS: Final = tuple(e * _digit_lo_bits for e in range(3))
+_EDGE_REFLECT: Final = tuple((3 - e) * _digit_lo_bits for e in range(3))
+# The LOD-0 neighbors and polarity of each d20 face, and the edge a neighboring d20 face uses to
+# return, indexed by [copolar][edge]. (Final, so that a compiled build reads these directly.)
+_RAW_NEIGHBORS: Final = tuple(tuple(nbrs) for nbrs in raw_neighbors)
+_BASE_SOUTH: Final = tuple(bool(fi & 0b1) for fi in CANONICAL_FACES_INDEXED)
+_CROSSING_EDGES: Final = ((0, 1, 2), (0, 2, 1))
 
 
 def find_neighbor(face_idx: FaceIdx, edge: int) -> Tuple[FaceIdx, int]:
@@ -39,80 +37,122 @@ def find_neighbor(face_idx: FaceIdx, edge: int) -> Tuple[FaceIdx, int]:
     Returns the neighbor's face_idx across the given edge, plus the edge that the neigbor would 
     use to return.    
     '''
-    # TODO: There is an even more efficient solution here. Once we have established the neighbor-
-    # ancestor of a given triangle, we know that the ascent path will comprise solely 0s and a
-    # single number in a pattern that is inverse of the descent path's 0s and its number. Ie:
-    # 2200 crosses to a new d20 and ascends as 0022
-    # 2222 becomes 0000
-    # 2022 becomes 0200
-    # This is true at least for contra-polar triangles. For co-polar triangles, I suspect that
-    # the inversion pattern holds true but the neighbor number is opposite. For example:
-    # 2200 becomes 0011
-    # 2222 becomes 0000 (still)
-    # 2022 becomes 0100
-    # But I haven't proven this for co-polar triangles yet.
-
-    # TODO: this code is hot and could benefit from Cython or mypyc or some other means of optimization.
+    # This works in constant time, without walking the LODs. Why it works:
+    #
+    # Edges do not rotate with subdivision, and the children lying along a parent's edge e are the
+    # two corner children other than e. Each of them lies along edge e with its own edge e. So a
+    # triangle whose finest k digits all avoid 3 and e lies along edge e of its ancestor k levels
+    # up. The finest digit that is a 3 or an e marks the common ancestor of the triangle and its
+    # neighbor: a center child's edge e faces corner child e, and vice versa, so that digit swaps
+    # 3 <-> e.
+    #
+    # Below the turn, the two triangles share edge e from opposite sides, so the corner that one
+    # calls V(e+1) is the other's V(e+2). Every finer digit therefore swaps e+1 <-> e+2, and the
+    # return edge is e. Both swaps are the same XOR against (3 - e), applied to the turning digit
+    # and everything below it (eg, 2200 ascends as 0022 over edge 1).
+    #
+    # A triangle that never turns lies along its d20 face's edge, and the neighbor is in the
+    # adjacent d20 face. Contra-polar faces also meet edge e to edge e, so the same XOR applies to
+    # all the digits. Co-polar faces only ever meet edge 1 to edge 2: their shared corner 0 stays
+    # put and the other corner digit becomes e (eg, 2200 ascends as 1100 over edge 1), which is an
+    # XOR 3 on each nonzero digit.
     assert edge >= 0 and edge <= 2
-    orig_lod, orig_d20, orig_path, is_south = unpack_face_idx(face_idx)
-    assert orig_lod >= 0 and orig_lod < 23
-
-    # Step #1 - the neighbors of LOD=0 d20 faces are precomputed.
-    if orig_lod == 0:
-        nbr_d20 = raw_neighbors[orig_d20][edge]
-        nbr_is_south = (CANONICAL_FACES_INDEXED[nbr_d20] & 1) != 0
-        _, _, nbr_edge = \
-            _get_nbr_chars(is_south, 0, edge, is_south == nbr_is_south)
-        return pack_face_idx(0, nbr_d20, 0, nbr_is_south), nbr_edge
-    lod, d20, path = orig_lod, orig_d20, orig_path
-    # Step #2 - we don't really care about LODs higher than the given face_idx's LOD.
-    path >>= (23 - orig_lod) * 2
-
-    # Step #3 - descend until we find the ancestor of the neighbor.
-    nbr_is_south = nbr_edge = None
-    nbr_d20 = d20
-    path_rev = 0
-    pos = None
-    while lod > 0:
-        pos = path & 3
-        path >>= 2
-        path_rev = (path_rev << 2) | pos
-
-        if pos == 3:
-            nbr_is_south, nbr_pos, nbr_edge = not is_south, edge, edge
-            break
-        elif pos == edge:
-            nbr_is_south, nbr_pos, nbr_edge = not is_south, 3, edge
-            break
-        # elif edge == 0:
-        #     nbr_is_south, nbr_pos, nbr_edge = not is_south, 2 if pos == 1 else 1, 0
-        #     break
-        lod -= 1
-
-    # Step #4 - did we drop all the way to the d20 level because we never crossed over a corner/
-    # central edge? Then we find the neighbor in the precomputed tables.
-    if lod == 0:
-        nbr_d20 = raw_neighbors[d20][edge]
-        nbr_is_south = (CANONICAL_FACES_INDEXED[nbr_d20] & 1) != 0
-        _, nbr_pos, nbr_edge = \
-            _get_nbr_chars(is_south, pos, edge, nbr_is_south == is_south)
-        lod = 1
-
-    # Step #5 - ascend, figuring out the neighbor's path by reflecting across the indicated edge.
-    nbr_path = path
-    while lod <= orig_lod:
-        lod += 1
-        nbr_path = (nbr_path << 2) | nbr_pos
-        path_rev >>= 2
-        pos = path_rev & 3
-        _, nbr_pos, _ = \
-            _get_nbr_chars(is_south, pos, edge, nbr_is_south == is_south)
-
-    # Step #6 - shift the neighbor's path to its proper position regarding unused LOD levels.
-    nbr_path <<= (23 - orig_lod) * 2
+    lod = face_idx >> 59
+    assert lod < 23
+    # The digits are worked on where they sit in the FaceIdx (the masks are all shifted up to bit
+    # 8), so that nothing is unpacked or repacked.
+    lod_mask = _lod_path_bits[lod]
+    path = face_idx & lod_mask
+    header = face_idx & _HEADER_MASK
+
+    # Step #1 - flag the digits that are 3 or equal to the edge (in the low bit of each slot), and
+    # find the finest one. Its slot is the common ancestor's level.
+    same = path ^ _EDGE_DIGITS[edge]
+    turning = ((path & (path >> 1)) | ~(same | (same >> 1))) & _digit_lo_bits & lod_mask
+
+    # Step #2 - the common ancestor is within this d20 face. Reflect the turning digit and all the
+    # finer ones.
+    if turning:
+        below = ((turning & -turning) << 2) - 1
+        return header | (path ^ (_EDGE_REFLECT[edge] & below & lod_mask)) | ((face_idx & 0b1) ^ 0b1), edge
+
+    # Step #3 - no common ancestor, so cross into the adjacent d20 face. The neighbors of LOD=0 d20
+    # faces are precomputed.
+    d20 = (face_idx >> 54) & 0b11111
+    nbr_d20 = _RAW_NEIGHBORS[d20][edge]
+    nbr_is_south = _BASE_SOUTH[nbr_d20]
+    copolar = nbr_is_south == bool(face_idx & 0b1)
+    if copolar:
+        nonzero = (path | (path >> 1)) & _digit_lo_bits
+        nbr_path = path ^ (nonzero | (nonzero << 1))
+    else:
+        nbr_path = path ^ (_EDGE_REFLECT[edge] & lod_mask)
 
     # Done.
-    return pack_face_idx(orig_lod, nbr_d20, nbr_path, nbr_is_south), nbr_edge
+    return (lod << 59) | (nbr_d20 << 54) | nbr_path | (0b1 if nbr_is_south else 0b0), \
+        _CROSSING_EDGES[copolar][edge]
+
+
+# <--------------------rings--------------------->
+def _get_rings(face_idx: FaceIdx, k: int) -> List[List[FaceIdx]]:
+    '''
+    Returns the rings of cells at 0, 1, ... k edge hops from the given cell.
+    '''
+    if k < 0:
+        raise ValueError(f"Ring distances must not be negative ({k}).")
+    visited = {face_idx}
+    rings = [[face_idx]]
+
+    # The frontier remembers which edge each cell was reached through. That edge only leads back
+    # into the previous ring, so each frontier cell needs only its other two edges queried, and a
+    # cell is expanded just once: when it joins the frontier.
+    frontier: List[Tuple[FaceIdx, int]] = [(face_idx, -1)]
+    for _ in range(k):
+        ring: List[FaceIdx] = []
+        next_frontier: List[Tuple[FaceIdx, int]] = []
+        for cell, came_from in frontier:
+            for edge in (0, 1, 2):
+                if edge == came_from:
+                    continue
+                nbr, nbr_edge = find_neighbor(cell, edge)
+                if nbr not in visited:
+                    visited.add(nbr)
+                    ring.append(nbr)
+                    next_frontier.append((nbr, nbr_edge))
+        rings.append(ring)
+        frontier = next_frontier
+    return rings
+
+
+def k_ring(face_idx: FaceIdx, k: int) -> List[FaceIdx]:
+    '''
+    Returns the cells exactly k edge hops away from the given cell (at the same LOD).
+    '''
+    return _get_rings(face_idx, k)[k]
+
+
+def k_disk(face_idx: FaceIdx, k: int) -> List[FaceIdx]:
+    '''
+    Returns the cells within k edge hops of the given cell (at the same LOD), including the cell
+    itself, in order of distance.
+    '''
+    return [cell for ring in _get_rings(face_idx, k) for cell in ring]
+
+
+def k_rings(face_ids: Sequence[FaceIdx], k: int) -> List[List[FaceIdx]]:
+    '''
+    Returns k_ring() for each of the given cells. Each center gets its own visited set, so
+    overlapping neighborhoods are still complete, and only one center's is held at a time.
+    '''
+    return [_get_rings(face_idx, k)[k] for face_idx in face_ids]
+
+
+def k_disks(face_ids: Sequence[FaceIdx], k: int) -> List[List[FaceIdx]]:
+    '''
+    Returns k_disk() for each of the given cells. Each center gets its own visited set, as in
+    k_rings().
+    '''
+    return [[cell for ring in _get_rings(face_idx, k) for cell in ring] for face_idx in face_ids]
 
 
 # <--------------------path-finding--------------------->
@@ -120,27 +160,153 @@ TChoiceHeuristic = Callable[[FaceIdx, FaceIdx], Tuple[int, int, int]]
 TWeightHeuristic = Callable[[FaceIdx, FaceIdx], float]
 
 
+# A search touches each face's center several times: once per step into it or out of it, and once
+# for its distance estimate.
+CENTER_CACHE_SIZE = 1 << 16
+
+
+@lru_cache(maxsize=CENTER_CACHE_SIZE)
+def _get_center(face_idx: FaceIdx) -> Tuple[float, float, float]:
+    return get_face_center(face_idx)
+
+
+def _get_center_angle(a: FaceIdx, b: FaceIdx) -> float:
+    '''
+    Returns the angle between the centers of two faces, in radians.
+    '''
+    u, v = _get_center(a), _get_center(b)
+    x = u[1] * v[2] - u[2] * v[1]
+    y = u[2] * v[0] - u[0] * v[2]
+    z = u[0] * v[1] - u[1] * v[0]
+    return atan2(sqrt(x * x + y * y + z * z), u[0] * v[0] + u[1] * v[1] + u[2] * v[2])
+
+
 def _default_choice_heuristic(start: FaceIdx, target: FaceIdx) -> Tuple[int, int, int]:
-    # TODO: a dumb dijksta's algorithm can find a path, but we can be more clever by looking at
-    # ancestor triangles.
+    # The edge order only breaks ties. (Steering by ancestor triangles is what
+    # find_path_hierarchical() does.)
     return (0, 1, 2)
 
 
 def _default_weight_finder(start: FaceIdx, target: FaceIdx) -> float:
-    return 1.0
+    return _get_center_angle(start, target)
+
+
+def _default_distance_heuristic(start: FaceIdx, target: FaceIdx) -> float:
+    return _get_center_angle(start, target)
 
 
 def find_path(
         start: FaceIdx,
         target: FaceIdx,
         choice_heuristic: TChoiceHeuristic = _default_choice_heuristic,
-        weight_heuristic: TWeightHeuristic = _default_weight_finder):
+        weight_heuristic: TWeightHeuristic = _default_weight_finder,
+        distance_heuristic: TWeightHeuristic = _default_distance_heuristic) -> Tuple[List[FaceIdx], float]:
+    '''
+    Returns the cheapest path from 'start' to 'target' (both included), stepping across edges
+    between faces of the same LOD, along with its total cost. This is an A* search:
+    - weight_heuristic(a, b) is the cost of stepping from face a to its neighbor b. It defaults to
+      the angle between the faces' centers, in radians; an infinite weight makes b impassable.
+    - distance_heuristic(a, target) estimates the remaining cost from face a. It defaults to the
+      angle between the centers. The path is the cheapest one as long as this never overestimates,
+      which holds for the defaults by the triangle inequality, and for any weights no smaller than
+      the angles.
+    - choice_heuristic(a, target) gives the order to try a's edges in, which only breaks ties.
+    Returns ([], inf) if every route to the target is impassable.
+    '''
+    if (start >> 59) != (target >> 59):
+        raise ValueError(f"Cannot path between faces at different LODs ({face_idx_to_str(start)} -> "
+                         f"{face_idx_to_str(target)}).")
+
+    # Queue entries are (estimated total cost, -cost so far, face): among equal estimates, the face
+    # furthest along goes first. Faces can be queued more than once, when a cheaper way to them turns
+    # up; 'done' skips the stale entries.
+    costs: Dict[FaceIdx, float] = {start: 0.0}
+    came_from: Dict[FaceIdx, FaceIdx] = {}
+    done: Set[FaceIdx] = set()
+    queue: List[Tuple[float, float, FaceIdx]] = [(distance_heuristic(start, target), 0.0, start)]
+    while queue:
+        face_idx = heapq.heappop(queue)[2]
+        if face_idx == target:
+            result = [face_idx]
+            while face_idx != start:
+                face_idx = came_from[face_idx]
+                result.append(face_idx)
+            result.reverse()
+            return result, costs[target]
+        if face_idx in done:
+            continue
+        done.add(face_idx)
+        cost = costs[face_idx]
+        for edge in choice_heuristic(face_idx, target):
+            nbr = find_neighbor(face_idx, edge)[0]
+            if nbr in done:
+                continue
+            nbr_cost = cost + weight_heuristic(face_idx, nbr)
+            if nbr_cost < costs.get(nbr, inf):
+                costs[nbr] = nbr_cost
+                came_from[nbr] = face_idx
+                heapq.heappush(queue, (nbr_cost + distance_heuristic(nbr, target), -nbr_cost, nbr))
+    return [], inf
+
+
+def _get_corridor(path: List[FaceIdx], halo: int) -> Set[FaceIdx]:
+    '''
+    Returns the faces of the path, and those within 'halo' steps of it.
+    '''
+    result: Set[FaceIdx] = set()
+    for face_idx in path:
+        result.update(k_disk(face_idx, halo))
+    return result
+
+
+def _get_corridor_weight(weight_heuristic: TWeightHeuristic, corridor: Set[FaceIdx],
+                         corridor_lod: int) -> TWeightHeuristic:
+    '''
+    Returns the weights, with every face outside the corridor's descendants made impassable.
+    '''
+    def corridor_weight(a: FaceIdx, b: FaceIdx) -> float:
+        if ancestor(b, corridor_lod) not in corridor:
+            return inf
+        return weight_heuristic(a, b)
+    return corridor_weight
+
+
+def find_path_hierarchical(
+        start: FaceIdx,
+        target: FaceIdx,
+        coarse_lod: int,
+        halo: int = 1,
+        choice_heuristic: TChoiceHeuristic = _default_choice_heuristic,
+        weight_heuristic: TWeightHeuristic = _default_weight_finder,
+        distance_heuristic: TWeightHeuristic = _default_distance_heuristic) -> Tuple[List[FaceIdx], float]:
     '''
-    Returns a path list starting from 'start' and going to 'target'. The path list will be accompanied 
+    Returns a path from 'start' to 'target' and its cost, as find_path() does, but plans it coarse to
+    fine. The route is first found between the endpoints' ancestors at coarse_lod. Then, one LOD at a
+    time, it is found again among the children of the previous route and of the faces within 'halo'
+    steps of it. Each pass searches a corridor a few faces wide, so the total cost grows with the
+    route's length rather than its area, at the price of missing cheaper routes outside the
+    corridor. Only the last pass uses the given heuristics; the others use the default (angle) ones.
     '''
-    result = []
+    lod = start >> 59
+    if (target >> 59) != lod:
+        raise ValueError(f"Cannot path between faces at different LODs ({face_idx_to_str(start)} -> "
+                         f"{face_idx_to_str(target)}).")
+    if coarse_lod < 0 or coarse_lod > lod:
+        raise ValueError(f"LOD {coarse_lod} is not an ancestor LOD of a LOD-{lod} face.")
+    if halo < 0:
+        raise ValueError(f"Negative halos are not permitted ({halo}).")
+    if coarse_lod == lod:
+        return find_path(start, target, choice_heuristic, weight_heuristic, distance_heuristic)
 
-    raise NotImplementedError()
+    path = find_path(ancestor(start, coarse_lod), ancestor(target, coarse_lod))[0]
+    for path_lod in range(coarse_lod + 1, lod):
+        weight = _get_corridor_weight(_default_weight_finder, _get_corridor(path, halo), path_lod - 1)
+        path = find_path(ancestor(start, path_lod), ancestor(target, path_lod), _default_choice_heuristic,
+                         weight)[0]
+    # The corridor's faces are edge-connected, so there is always a route inside it, unless the
+    # weights rule it out.
+    weight = _get_corridor_weight(weight_heuristic, _get_corridor(path, halo), lod - 1)
+    return find_path(start, target, choice_heuristic, weight, distance_heuristic)
 
 
 if __name__ == '__main__':
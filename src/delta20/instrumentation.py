@@ -0,0 +1,161 @@
+'''
+Opt-in counters for the hot packing and indexing functions: how often each is called, the time
+spent in it, and, for find_neighbor(), how many levels each call ascended before turning (the
+number of path digits it reflected) and how often it had to cross into another d20 face.
+
+    from delta20 import instrumentation
+    instrumentation.enable()
+    ... run the workload ...
+    print(instrumentation.to_prometheus())
+    instrumentation.disable()
+
+enable() swaps the functions for counting wrappers, in every loaded delta20 module that refers to
+them, and disable() swaps the originals back. So when disabled, nothing is wrapped and nothing is
+checked on each call. Code outside delta20 that imported a function by name before enable() keeps
+the original, uncounted one; import the module instead (eg, indexing.find_neighbor()). In a mypyc
+build, calls from within a compiled module are bound directly, and are not counted either.
+
+Times are inclusive (k_ring() includes the find_neighbor() calls it makes) and the wrappers add
+their own overhead, so use them to compare, not as absolute costs.
+'''
+from __future__ import annotations
+import sys
+from time import perf_counter
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from delta20 import indexing, packing
+from delta20.defs import FaceIdx
+from delta20.packing import _d20_mask, _path_mask
+
+# The instrumented functions, by module.
+INSTRUMENTED: Dict[ModuleType, Tuple[str, ...]] = {
+    packing: ("pack_face_idx", "unpack_face_idx", "get_pos", "build_path", "parent", "children",
+              "ancestor"),
+    indexing: ("find_neighbor", "k_ring", "k_disk", "find_path", "find_path_hierarchical"),
+}
+
+_calls: Dict[str, int] = {}
+_seconds: Dict[str, float] = {}
+# _ascents[k] counts the find_neighbor() calls that turned k levels up. Crossings ascend all of
+# their LOD's levels to reach the d20 face, and are also counted in _crossings.
+_ascents: List[int] = [0] * 24
+_crossings: List[int] = [0]
+# The original of each swapped function, by (module, name), while enabled.
+_originals: Dict[Tuple[str, str], Callable[..., Any]] = {}
+
+
+def _count(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    def counted(*args: Any, **kwargs: Any) -> Any:
+        start = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _seconds[name] += perf_counter() - start
+            _calls[name] += 1
+    counted.__name__ = counted.__qualname__ = fn.__name__
+    counted.__doc__ = fn.__doc__
+    counted.__wrapped__ = fn  # type: ignore[attr-defined]
+    return counted
+
+
+def _count_find_neighbor(fn: Callable[[FaceIdx, int], Tuple[FaceIdx, int]]) -> Callable[..., Any]:
+    def find_neighbor(face_idx: FaceIdx, edge: int) -> Tuple[FaceIdx, int]:
+        start = perf_counter()
+        nbr = fn(face_idx, edge)
+        _seconds["find_neighbor"] += perf_counter() - start
+        _calls["find_neighbor"] += 1
+
+        # The neighbor differs from the face in exactly the digits that were reflected, from the
+        # turning digit down, so the coarsest changed digit gives the ascent.
+        lod = face_idx >> 59
+        if (nbr[0] ^ face_idx) & _d20_mask:
+            _ascents[lod] += 1
+            _crossings[0] += 1
+        else:
+            changed = (nbr[0] ^ face_idx) & _path_mask
+            _ascents[lod - (54 - changed.bit_length()) // 2] += 1
+        return nbr
+    find_neighbor.__doc__ = fn.__doc__
+    find_neighbor.__wrapped__ = fn  # type: ignore[attr-defined]
+    return find_neighbor
+
+
+def is_enabled() -> bool:
+    '''Whether the functions are currently swapped for counting ones.'''
+    return bool(_originals)
+
+
+def enable() -> None:
+    '''
+    Starts counting. The counters carry on from where they were; see reset().
+    '''
+    if _originals:
+        return
+    for module, names in INSTRUMENTED.items():
+        for name in names:
+            original: Callable[..., Any] = getattr(module, name)
+            _calls.setdefault(name, 0)
+            _seconds.setdefault(name, 0.0)
+            wrapped = _count_find_neighbor(original) if name == "find_neighbor" else _count(name, original)
+            # Swap it everywhere it was imported by name within delta20, too.
+            for other_name, other in list(sys.modules.items()):
+                if other_name.split(".")[0] == "delta20" and getattr(other, name, None) is original:
+                    _originals[(other_name, name)] = original
+                    setattr(other, name, wrapped)
+
+
+def disable() -> None:
+    '''
+    Stops counting, and puts the original functions back. The counters keep their values.
+    '''
+    while _originals:
+        (module_name, name), original = _originals.popitem()
+        setattr(sys.modules[module_name], name, original)
+
+
+def reset() -> None:
+    '''
+    Zeroes all the counters.
+    '''
+    for name in _calls:
+        _calls[name] = 0
+        _seconds[name] = 0.0
+    _ascents[:] = [0] * len(_ascents)
+    _crossings[0] = 0
+
+
+def snapshot() -> Dict[str, Any]:
+    '''
+    Returns a copy of the counters:
+        {"calls": {function: count}, "seconds": {function: total},
+         "find_neighbor": {"ascents": [count per number of levels ascended], "d20_crossings": count}}
+    '''
+    last = max((k for k, count in enumerate(_ascents) if count), default=-1)
+    return {"calls": dict(_calls), "seconds": dict(_seconds),
+            "find_neighbor": {"ascents": _ascents[:last + 1], "d20_crossings": _crossings[0]}}
+
+
+def to_prometheus(prefix: str = "delta20") -> str:
+    '''
+    Returns the counters in the Prometheus text exposition format.
+    '''
+    lines: List[str] = []
+
+    def add(name: str, doc: str, samples: List[Tuple[str, Union[int, float]]]) -> None:
+        lines.append(f"# HELP {prefix}_{name} {doc}")
+        lines.append(f"# TYPE {prefix}_{name} counter")
+        lines.extend(f"{prefix}_{name}{labels} {value}" for labels, value in samples)
+
+    add("calls_total", "Calls to each instrumented function.",
+        [(f'{{function="{name}"}}', count) for name, count in sorted(_calls.items())])
+    add("seconds_total", "Time spent in each instrumented function, including nested calls.",
+        [(f'{{function="{name}"}}', seconds) for name, seconds in sorted(_seconds.items())])
+    add("find_neighbor_ascents_total", "find_neighbor() calls, by the number of levels ascended.",
+        [(f'{{levels="{k}"}}', count) for k, count in enumerate(snapshot()["find_neighbor"]["ascents"])])
+    add("find_neighbor_d20_crossings_total", "find_neighbor() calls that crossed into another d20 face.",
+        [("", _crossings[0])])
+    return "\n".join(lines) + "\n"
+
+
+__all__ = ["INSTRUMENTED", "disable", "enable", "is_enabled", "reset", "snapshot", "to_prometheus"]
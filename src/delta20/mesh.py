@@ -0,0 +1,237 @@
+'''
+Adaptive meshes: a set of leaf faces that tiles the globe at mixed LODs, kept 2:1 balanced across
+edges as it is refined and coarsened. Everything works from the indices, with find_neighbor() hops.
+'''
+from __future__ import annotations
+from typing import AbstractSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from delta20.defs import FaceIdx
+from delta20.indexing import find_neighbor
+from delta20.packing import _lod_mask, child_position, children, pack_face_idx, parent
+
+
+def _find_leaf_ancestor(face_idx: FaceIdx, leaves: AbstractSet[FaceIdx]) -> Optional[FaceIdx]:
+    '''
+    Returns the leaf that is the given face or one of its ancestors, or None if the face is split
+    into finer leaves.
+    '''
+    while True:
+        if face_idx in leaves:
+            return face_idx
+        if (face_idx & _lod_mask) == 0:
+            return None
+        face_idx = parent(face_idx)
+
+
+def find_leaf_neighbors(face_idx: FaceIdx, edge: int, leaf_set: AbstractSet[FaceIdx],
+                        max_lod: int) -> List[Tuple[FaceIdx, int]]:
+    '''
+    Returns the leaves across the given edge of a face, each with its edge back to the face: the
+    same-LOD neighbor, a coarser face containing it, or the finer faces along the edge, in order
+    from the face's corner V(edge+1) to V(edge+2). Returns an empty list if the leaves do not reach
+    the edge (eg, the face is inside a coarser leaf).
+
+    max_lod is the finest LOD in leaf_set (or any finer one), which bounds the search for finer
+    leaves along the edge. Keep it alongside the set, as AdaptiveMesh does, rather than scanning the
+    set for each call.
+    '''
+    nbr, nbr_edge = find_neighbor(face_idx, edge)
+
+    # Step #1 - walk up. A corner child's edges lie on its parent's edges of the same number, except
+    # the one facing the center child (its own position). The center child's edges are all inside
+    # the parent, so the walk stops there: a leaf above would contain the face as well.
+    up = nbr
+    while up not in leaf_set:
+        if (up & _lod_mask) == 0:
+            break
+        pos = child_position(up)
+        if pos == 3 or pos == nbr_edge:
+            break
+        up = parent(up)
+    else:
+        return [(up, nbr_edge)]
+
+    # If a leaf further up contains the neighbor, it contains the whole edge, and the face too.
+    if _find_leaf_ancestor(up, leaf_set) is not None:
+        return []
+
+    # Step #2 - walk down. The edge is split between the two corner children away from the opposite
+    # corner, each of which keeps it as the same edge. V(ne+2) is the face's V(edge+1), so that
+    # corner's child comes first. Nothing is finer than max_lod, so the walk stops there, even if
+    # the leaves do not cover the edge (eg, a partial set).
+    result: List[Tuple[FaceIdx, int]] = []
+    first, second = (nbr_edge + 2) % 3, (nbr_edge + 1) % 3
+    work = [nbr]
+    while work:
+        down = work.pop()
+        if down in leaf_set:
+            result.append((down, nbr_edge))
+        elif (down >> 59) < max_lod:
+            kids = children(down)
+            work.append(kids[second])
+            work.append(kids[first])
+    return result
+
+
+class AdaptiveMesh:
+    '''
+    The active leaf faces of an adaptive mesh, in a set. Between them, the leaves cover the globe
+    exactly once, and faces that share an edge are at most one LOD apart (2:1 balance), including
+    across d20 seams.
+
+    refine() and coarsen() update the mesh in place, and return only what changed, as
+    (added, removed) lists of faces.
+    '''
+    __slots__ = ("_leaves", "_lod_counts")
+
+    def __init__(self, leaves: Optional[Iterable[FaceIdx]] = None):
+        '''
+        Makes a mesh of the 20 d20 faces, or of the given leaves. The leaves must tile the globe;
+        any coarse ones that break the balance get refined.
+        '''
+        # How many leaves there are at each LOD, to know the finest one.
+        self._lod_counts = [0] * 23
+        if leaves is None:
+            self._leaves = {pack_face_idx(0, d20, 0) for d20 in range(20)}
+            self._lod_counts[0] = 20
+        else:
+            self._leaves = set(leaves)
+            for leaf in self._leaves:
+                self._lod_counts[leaf >> 59] += 1
+            added: Set[FaceIdx] = set()
+            removed: Set[FaceIdx] = set()
+            self._balance(list(self._leaves), added, removed)
+
+    @property
+    def leaves(self) -> Set[FaceIdx]:
+        '''The leaf faces. (A copy.)'''
+        return set(self._leaves)
+
+    @property
+    def max_lod(self) -> int:
+        '''The finest LOD of any leaf.'''
+        return max(lod for lod, count in enumerate(self._lod_counts) if count)
+
+    def __len__(self) -> int:
+        return len(self._leaves)
+
+    def __iter__(self) -> Iterator[FaceIdx]:
+        return iter(self._leaves)
+
+    def __contains__(self, face_idx: FaceIdx) -> bool:
+        return face_idx in self._leaves
+
+    def find_leaf(self, face_idx: FaceIdx) -> Optional[FaceIdx]:
+        '''
+        Returns the leaf that is the given face or covers it, or None if the face is split into
+        finer leaves.
+        '''
+        return _find_leaf_ancestor(face_idx, self._leaves)
+
+    def find_leaf_neighbors(self, face_idx: FaceIdx, edge: int) -> List[Tuple[FaceIdx, int]]:
+        '''
+        Returns the leaves across the given edge of a face, as find_leaf_neighbors() does.
+        '''
+        return find_leaf_neighbors(face_idx, edge, self._leaves, self.max_lod)
+
+    def _split(self, face_idx: FaceIdx, added: Set[FaceIdx], removed: Set[FaceIdx]) -> Tuple[FaceIdx, ...]:
+        kids = children(face_idx)
+        self._leaves.remove(face_idx)
+        self._leaves.update(kids)
+        self._lod_counts[face_idx >> 59] -= 1
+        self._lod_counts[(face_idx >> 59) + 1] += 4
+        # A face both added and removed by the same call did not change.
+        if face_idx in added:
+            added.remove(face_idx)
+        else:
+            removed.add(face_idx)
+        added.update(kids)
+        return kids
+
+    def _balance(self, work: List[FaceIdx], added: Set[FaceIdx], removed: Set[FaceIdx]) -> None:
+        '''
+        Refines leaves until none is more than one LOD coarser than a leaf in 'work' across an edge.
+        Refinement only ever makes faces finer, so only coarser neighbors need looking at, and only
+        the newly split faces can upset the balance again.
+        '''
+        while work:
+            face_idx = work.pop()
+            if face_idx not in self._leaves:
+                continue
+            lod = face_idx >> 59
+            for edge in range(3):
+                nbr = _find_leaf_ancestor(find_neighbor(face_idx, edge)[0], self._leaves)
+                if nbr is not None and (nbr >> 59) < lod - 1:
+                    work.extend(self._split(nbr, added, removed))
+                    # The face may need another pass, if the neighbor is still too coarse.
+                    work.append(face_idx)
+
+    def refine(self, cells: Iterable[FaceIdx]) -> Tuple[List[FaceIdx], List[FaceIdx]]:
+        '''
+        Splits each of the given leaves into its four children, then refines whatever neighbors
+        that leaves too coarse. Faces that are not leaves, or are at LOD 22, are skipped. Returns
+        the (added, removed) faces.
+        '''
+        added: Set[FaceIdx] = set()
+        removed: Set[FaceIdx] = set()
+        work: List[FaceIdx] = []
+        for face_idx in cells:
+            if face_idx in self._leaves and (face_idx >> 59) < 22:
+                work.extend(self._split(face_idx, added, removed))
+        self._balance(work, added, removed)
+        return sorted(added), sorted(removed)
+
+    def coarsen(self, cells: Iterable[FaceIdx]) -> Tuple[List[FaceIdx], List[FaceIdx]]:
+        '''
+        Merges each of the given leaves, with its three siblings, back into their parent. A merge is
+        skipped if a sibling is not a leaf, or if the parent would be more than one LOD coarser than
+        a neighboring leaf; coarsening never forces changes elsewhere. Faces that are not leaves, or
+        are at LOD 0, are skipped. Returns the (added, removed) faces.
+        '''
+        added: Set[FaceIdx] = set()
+        removed: Set[FaceIdx] = set()
+        # Finest first, so that merged parents can in turn be merged, if listed.
+        for face_idx in sorted(cells, reverse=True):
+            if face_idx not in self._leaves or (face_idx & _lod_mask) == 0:
+                continue
+            merged = parent(face_idx)
+            kids = children(merged)
+            if not all(kid in self._leaves for kid in kids) or not self._can_merge(kids):
+                continue
+            self._leaves.difference_update(kids)
+            self._leaves.add(merged)
+            self._lod_counts[face_idx >> 59] -= 4
+            self._lod_counts[merged >> 59] += 1
+            for kid in kids:
+                if kid in added:
+                    added.remove(kid)
+                else:
+                    removed.add(kid)
+            added.add(merged)
+        return sorted(added), sorted(removed)
+
+    def _can_merge(self, kids: Tuple[FaceIdx, ...]) -> bool:
+        # The parent stays balanced if no neighbor of the children (outside the family) is split
+        # below the children's LOD.
+        for kid in kids[:3]:
+            for edge in range(3):
+                nbr = find_neighbor(kid, edge)[0]
+                if nbr not in kids and _find_leaf_ancestor(nbr, self._leaves) is None:
+                    return False
+        return True
+
+    def is_balanced(self) -> bool:
+        '''
+        Returns whether every pair of leaves that share an edge is at most one LOD apart. (It is,
+        unless the leaves were changed from outside.)
+        '''
+        for face_idx in self._leaves:
+            lod = face_idx >> 59
+            for edge in range(3):
+                nbr = _find_leaf_ancestor(find_neighbor(face_idx, edge)[0], self._leaves)
+                if nbr is not None and (nbr >> 59) < lod - 1:
+                    return False
+        return True
+
+
+__all__ = ["AdaptiveMesh", "find_leaf_neighbors"]
@@ -1,13 +1,20 @@
 from __future__ import annotations
-from typing import Tuple
+from typing import Final, Optional, Tuple, Union
 from .defs import VertexIdx, FaceIdx
 from delta20.precomputed.canonical_d20 import CANONICAL_FACES_INDEXED
 
-_lod_mask = 0b11111 << 59
-_d20_mask = 0b11111 << 54
-_path_mask = ((0b1 << 46) - 1) << 8
-_vertex_idx_mask = (1 << 51) - 1
-_flag_mask = (0b1 << 8) - 1
+# (Final, so that a compiled build reads these directly.)
+_lod_mask: Final = 0b11111 << 59
+_d20_mask: Final = 0b11111 << 54
+_path_mask: Final = ((0b1 << 46) - 1) << 8
+_vertex_idx_mask: Final = (1 << 51) - 1
+_flag_mask: Final = (0b1 << 8) - 1
+_canonical_faces_indexed: Final = tuple(CANONICAL_FACES_INDEXED)
+# For each LOD, the bits of a packed FaceIdx that hold the path digits that LOD uses. The digit for
+# LOD n sits at bits (54 - 2n, 55 - 2n).
+_lod_path_bits: Final = tuple(((1 << (2 * lod)) - 1) << (54 - 2 * lod) for lod in range(23))
+# The low bit of every digit slot of a packed path: 0b01 01 ... 01 << 8.
+_digit_lo_bits: Final = ((4 ** 23 - 1) // 3) << 8
 
 
 def get_pos(path: int, lod: int) -> int:
@@ -29,7 +36,7 @@ def get_pos(path: int, lod: int) -> int:
     return (path >> (2 * (22 - lod))) & 0b11
 
 
-def build_path(*route) -> int:
+def build_path(*route: Union[int, str]) -> int:
     '''
     Builds the left-aligned path from the given 0-3 numbers, in a format ready to give to 
     pack_face_idx()
@@ -41,19 +48,17 @@ def build_path(*route) -> int:
     if len(route) == 1:
         r = route[0]
         if isinstance(r, str):
-            r = tuple(int(item) for item in list(r))
-            return build_path(*r)
+            return build_path(*[int(item) for item in r])
         # The values 4..9 can break things
         assert (r >= 0 and r <= 3) or r >= 10
         if r > 3:
-            r = tuple(int(item) for item in list(str(r)))
-            return build_path(*r)
+            return build_path(*[int(item) for item in str(r)])
 
     result = 0b0
-    for r in route:
-        assert 0 <= r <= 3
+    for digit in route:
+        assert isinstance(digit, int) and 0 <= digit <= 3
         result <<= 2
-        result |= r
+        result |= digit
 
     # For example, (1,3,2) will end up left-packed like so:
     # 0q 13 2000000000 0000000000
@@ -61,7 +66,7 @@ def build_path(*route) -> int:
     return result
 
 
-def pack_face_idx(lod: int, d20: int, path: int, is_south: bool = None) -> FaceIdx:
+def pack_face_idx(lod: int, d20: int, path: int, is_south: Optional[bool] = None) -> FaceIdx:
     # The 64 bits of a face_idx are packed like so:
     #    lod        d20        path (MSD)     flags
     # (5 bits) | (5 bits) |    (46 bits)   | (8 bits)
@@ -74,16 +79,11 @@ def pack_face_idx(lod: int, d20: int, path: int, is_south: bool = None) -> FaceI
         raise ValueError(f"D20 faces outside 0..19 are not permitted ({d20}).")
 
     if is_south is None:
-        # auto-calculate the polarity
-        d20_idx = CANONICAL_FACES_INDEXED[d20]
-        is_south = (d20_idx & 0b1) == 0b1
-        _path = path >> ((23 - lod) * 2)
-        _lod = lod
-        while _lod > 0:
-            if (_path & 0b11) == 0b11:
-                is_south = not is_south
-            _path >>= 2
-            _lod -= 1
+        # auto-calculate the polarity: every digit-3 the LOD uses flips it. AND each digit slot's
+        # two bits together to flag the 3s, and count them.
+        digits = (path << 8) & _lod_path_bits[lod]
+        threes = bin(digits & (digits >> 1) & _digit_lo_bits).count("1")
+        is_south = ((_canonical_faces_indexed[d20] ^ threes) & 0b1) == 0b1
     return (lod << 59) | (d20 << 54) | (path << 8) | (0b1 if is_south else 0b0)
 
 
@@ -113,7 +113,7 @@ def unpack_vertex_idx(vertex_idx: VertexIdx) -> Tuple[int, int, int]:
     return lod, d20, index
 
 
-def face_idx_to_str(face_idx: FaceIdx):
+def face_idx_to_str(face_idx: FaceIdx) -> str:
     # '0b0100 0000000000 0000000000 0000000000 0000000000'
     #      ^
     #      40
@@ -125,5 +125,117 @@ def face_idx_to_str(face_idx: FaceIdx):
     return f"lod={lod}, d20={d20}, path={''.join(path_str)}, flags={bin(flags)}"
 
 
-__all__ = ["build_path", "face_idx_to_str", "get_pos", "pack_face_idx", "pack_vertex_idx",
-           "unpack_face_idx", "unpack_vertex_idx"]
+# <--------------------hierarchy--------------------->
+# These work directly on the packed bits. The polarity flag is kept up to date from the digit-3
+# rule (every center child flips), rather than recounted as pack_face_idx() would.
+def child_position(face_idx: FaceIdx) -> int:
+    '''
+    Returns the position (0..3) of the given face within its parent.
+    '''
+    lod = (face_idx & _lod_mask) >> 59
+    if lod == 0:
+        raise ValueError("LOD-0 faces have no parent.")
+    return (face_idx >> (54 - 2 * lod)) & 0b11
+
+
+def parent(face_idx: FaceIdx) -> FaceIdx:
+    '''
+    Returns the parent of the given face.
+    '''
+    lod = (face_idx & _lod_mask) >> 59
+    if lod == 0:
+        raise ValueError("LOD-0 faces have no parent.")
+    shift = 54 - 2 * lod
+    pos = (face_idx >> shift) & 0b11
+    result = (face_idx & ~(_lod_mask | (0b11 << shift))) | ((lod - 1) << 59)
+    return result ^ 0b1 if pos == 3 else result
+
+
+def children(face_idx: FaceIdx) -> Tuple[FaceIdx, FaceIdx, FaceIdx, FaceIdx]:
+    '''
+    Returns the four children of the given face, in position order (0..3).
+    '''
+    lod = (face_idx & _lod_mask) >> 59
+    if lod >= 22:
+        raise ValueError(f"LODs outside 0..22 are not permitted ({lod + 1}).")
+    shift = 52 - 2 * lod
+    base = (face_idx & ~_lod_mask) | ((lod + 1) << 59)
+    return base, base | (0b01 << shift), base | (0b10 << shift), (base | (0b11 << shift)) ^ 0b1
+
+
+def ancestor(face_idx: FaceIdx, lod: int) -> FaceIdx:
+    '''
+    Returns the ancestor of the given face at the given LOD, which may be the face's own LOD.
+    '''
+    face_lod = (face_idx & _lod_mask) >> 59
+    if lod < 0 or lod > face_lod:
+        raise ValueError(f"LOD {lod} is not an ancestor LOD of a LOD-{face_lod} face.")
+    # The dropped digits flip the polarity once per 3 among them. Mask the digits, AND each slot's
+    # two bits together to flag the 3s, and count them.
+    dropped = face_idx & _lod_path_bits[face_lod] & ~_lod_path_bits[lod]
+    threes = bin(dropped & (dropped >> 1) & _digit_lo_bits).count("1")
+    result = (face_idx & ~(_lod_mask | dropped)) | (lod << 59)
+    return result ^ (threes & 0b1)
+
+
+def is_ancestor(ancestor_idx: FaceIdx, face_idx: FaceIdx) -> bool:
+    '''
+    Returns whether ancestor_idx is the given face itself or one of its ancestors.
+    '''
+    lod = (ancestor_idx & _lod_mask) >> 59
+    if lod > (face_idx & _lod_mask) >> 59:
+        return False
+    return ((ancestor_idx ^ face_idx) & (_d20_mask | _lod_path_bits[lod])) == 0
+
+
+# <--------------------range keys--------------------->
+# A FaceIdx sorts by LOD first, so a face's descendants are spread over 22 LODs' worth of ranges.
+# A range key instead packs the path digits followed by a terminator bit, S2-style:
+#     d20          path (MSD)      1     0...0
+#  (5 bits) | (2 bits per LOD) | (1) | (the rest)
+# Every descendant of a face then shares its key's bits above the terminator, so the whole subtree
+# sorts into one contiguous interval: [range_min(f), range_max(f)]. The polarity is not stored; it
+# is recounted from the path when unpacking.
+def to_range_key(face_idx: FaceIdx) -> int:
+    '''
+    Returns the range key of the given face.
+    '''
+    lod = (face_idx & _lod_mask) >> 59
+    return ((face_idx & _d20_mask) << 5) | ((face_idx & _lod_path_bits[lod]) << 5) | (1 << (58 - 2 * lod))
+
+
+def from_range_key(key: int) -> FaceIdx:
+    '''
+    Returns the face with the given range key.
+    '''
+    terminator = key & -key
+    shift = terminator.bit_length() - 1
+    d20 = key >> 59
+    if key <= 0 or key >= (1 << 64) or shift < 14 or (shift & 0b1) != 0 or d20 >= 20:
+        raise ValueError(f"Not a valid range key ({key}).")
+    lod = (58 - shift) >> 1
+    path_bits = ((key ^ terminator) >> 5) & _lod_path_bits[lod]
+    threes = bin(path_bits & (path_bits >> 1) & _digit_lo_bits).count("1")
+    is_south = (_canonical_faces_indexed[d20] ^ threes) & 0b1
+    return (lod << 59) | (d20 << 54) | path_bits | is_south
+
+
+def range_min(face_idx: FaceIdx) -> int:
+    '''
+    Returns the smallest range key of the given face and its descendants.
+    '''
+    key = to_range_key(face_idx)
+    return key - (key & -key) + 1
+
+
+def range_max(face_idx: FaceIdx) -> int:
+    '''
+    Returns the largest range key of the given face and its descendants.
+    '''
+    key = to_range_key(face_idx)
+    return key + (key & -key) - 1
+
+
+__all__ = ["ancestor", "build_path", "child_position", "children", "face_idx_to_str", "from_range_key",
+           "get_pos", "is_ancestor", "pack_face_idx", "pack_vertex_idx", "parent", "range_max",
+           "range_min", "to_range_key", "unpack_face_idx", "unpack_vertex_idx"]
@@ -0,0 +1,181 @@
+'''
+Shared vertex indexing. Every vertex of the subdivided globe has exactly one VertexIdx, no matter
+which of its (up to six) faces it is reached from, and no matter the LOD. See CONVENTIONS.md for
+the packing.
+'''
+from __future__ import annotations
+from typing import Tuple
+
+from delta20.defs import VertexIdx, FaceIdx
+from delta20.geometry import _get_triangle
+from delta20.indexing import find_neighbor
+from delta20.packing import pack_face_idx, pack_vertex_idx, unpack_face_idx, unpack_vertex_idx
+from delta20.precomputed.canonical_d20 import CANONICAL_FACES, CANONICAL_FACES_INDEXED, CANONICAL_VERTS
+
+# The d20 value that marks the 12 original icosahedron vertices, which no single face owns.
+UNOWNED_D20 = 0b11111
+
+_coord_bits = 23
+_coord_mask = (1 << _coord_bits) - 1
+
+# For each d20 face and edge: the d20 face across that edge, and the edge it uses to return.
+_D20_EDGE_NEIGHBORS = tuple(
+    tuple((unpack_face_idx(nbr)[1], nbr_edge) for nbr, nbr_edge in (find_neighbor(fi, e) for e in range(3)))
+    for fi in CANONICAL_FACES_INDEXED)
+
+# For each of the 12 icosahedron vertices, one d20 face that has it as a corner, and which corner.
+_CORNER_FACES = {vid: (d20, k) for d20, fi in reversed(tuple(enumerate(CANONICAL_FACES_INDEXED)))
+                 for k, vid in enumerate(CANONICAL_FACES[fi])}
+
+
+def _get_vertex_idx(d20: int, lod: int, a: int, b: int, c: int) -> VertexIdx:
+    '''
+    Returns the canonical VertexIdx of the lattice point (a, b, c) on the given d20 face at the given
+    LOD, where a + b + c == 2 ** lod are the point's weights on the face's corners (V0, V1, V2).
+    '''
+    # Step #1 - reduce to the LOD where the vertex first appears. Halving all three weights halves
+    # the lattice, which is the parent LOD.
+    while lod > 0 and ((a | b | c) & 1) == 0:
+        a, b, c, lod = a >> 1, b >> 1, c >> 1, lod - 1
+
+    # Step #2 - the original icosahedron vertices are already indexed.
+    if lod == 0:
+        return CANONICAL_FACES[CANONICAL_FACES_INDEXED[d20]][0 if a else 1 if b else 2]
+
+    # Step #3 - a vertex on a d20 edge belongs to the lower-numbered of the two faces. The faces
+    # share the edge from opposite sides, so the corner this face calls V(e+1) is the neighbor's
+    # V(ne+2), and V(e+2) is the neighbor's V(ne+1).
+    weights = (a, b, c)
+    if 0 in weights:
+        edge = weights.index(0)
+        nbr_d20, nbr_edge = _D20_EDGE_NEIGHBORS[d20][edge]
+        if nbr_d20 < d20:
+            nbr_weights = [0, 0, 0]
+            nbr_weights[(nbr_edge + 2) % 3] = weights[(edge + 1) % 3]
+            nbr_weights[(nbr_edge + 1) % 3] = weights[(edge + 2) % 3]
+            d20, (a, b, c) = nbr_d20, nbr_weights
+
+    # Done.
+    return pack_vertex_idx(lod, d20, (b << _coord_bits) | c)
+
+
+def face_vertices(face_idx: FaceIdx) -> Tuple[VertexIdx, VertexIdx, VertexIdx]:
+    '''
+    Returns the VertexIdx of each corner (V0, V1, V2) of the given face. Faces that share a corner
+    get the same VertexIdx for it.
+    '''
+    lod, d20, path, _ = unpack_face_idx(face_idx)
+
+    # Walk the path on the lattice of the face's LOD, where each d20 corner has weight 2 ** lod. The
+    # children's corners are the parent's corners and edge midpoints, just as in the geometry.
+    n = 1 << lod
+    p0, p1, p2 = (n, 0, 0), (0, n, 0), (0, 0, n)
+    for shift in range(44, 44 - 2 * lod, -2):
+        m01 = ((p0[0] + p1[0]) >> 1, (p0[1] + p1[1]) >> 1, (p0[2] + p1[2]) >> 1)
+        m12 = ((p1[0] + p2[0]) >> 1, (p1[1] + p2[1]) >> 1, (p1[2] + p2[2]) >> 1)
+        m20 = ((p2[0] + p0[0]) >> 1, (p2[1] + p0[1]) >> 1, (p2[2] + p0[2]) >> 1)
+        pos = (path >> shift) & 0b11
+        if pos == 0:
+            p1, p2 = m01, m20
+        elif pos == 1:
+            p0, p2 = m01, m12
+        elif pos == 2:
+            p0, p1 = m20, m12
+        else:
+            p0, p1, p2 = m12, m20, m01
+    return _get_vertex_idx(d20, lod, *p0), _get_vertex_idx(d20, lod, *p1), _get_vertex_idx(d20, lod, *p2)
+
+
+def vertex_position(vertex_idx: VertexIdx) -> Tuple[float, float, float]:
+    '''
+    Returns the unit vector of the given vertex.
+    '''
+    lod, d20, index = unpack_vertex_idx(vertex_idx)
+    if d20 == UNOWNED_D20:
+        if vertex_idx not in CANONICAL_VERTS:
+            raise ValueError(f"Not an icosahedron vertex ({vertex_idx}).")
+        return CANONICAL_VERTS[vertex_idx]
+    b, c = index >> _coord_bits, index & _coord_mask
+    a = (1 << lod) - b - c
+    if d20 >= 20 or a < 0:
+        raise ValueError(f"Not a valid vertex index ({vertex_idx}).")
+
+    # Descend into whichever child has the vertex in its closure, re-expressing the weights in that
+    # child's corners, until the vertex is one of the corners. The geometry then comes from the
+    # same (cached) subdivision as the faces.
+    n, depth, digits = 1 << lod, 0, 0
+    while n not in (a, b, c):
+        n >>= 1
+        if a >= n:
+            a, pos = a - n, 0
+        elif b >= n:
+            b, pos = b - n, 1
+        elif c >= n:
+            c, pos = c - n, 2
+        else:
+            a, b, c, pos = n - a, n - b, n - c, 3
+        depth, digits = depth + 1, (digits << 2) | pos
+    return _get_triangle(d20, depth, digits)[(a, b, c).index(n)]
+
+
+def _get_incident_face(vertex_idx: VertexIdx, lod: int) -> Tuple[FaceIdx, int]:
+    '''
+    Returns one face at the given LOD that has the vertex as a corner, and which corner it is.
+    '''
+    vertex_lod, d20, index = unpack_vertex_idx(vertex_idx)
+    if lod < vertex_lod or lod >= 23:
+        raise ValueError(f"Vertex {vertex_idx} does not exist at LOD {lod}.")
+    if d20 == UNOWNED_D20:
+        if vertex_idx not in _CORNER_FACES:
+            raise ValueError(f"Not an icosahedron vertex ({vertex_idx}).")
+        d20, k = _CORNER_FACES[vertex_idx]
+        weights = [0, 0, 0]
+        weights[k] = 1
+        a, b, c = weights
+    else:
+        b, c = index >> _coord_bits, index & _coord_mask
+        a = (1 << vertex_lod) - b - c
+        if d20 >= 20 or a < 0:
+            raise ValueError(f"Not a valid vertex index ({vertex_idx}).")
+
+    # Scale the weights to the lattice of the requested LOD, then descend as vertex_position()
+    # does. Once the vertex is a corner, the same rule keeps picking the child at that corner.
+    shift = lod - vertex_lod
+    a, b, c, n = a << shift, b << shift, c << shift, 1 << lod
+    path = 0
+    is_south = (CANONICAL_FACES_INDEXED[d20] & 0b1) == 0b1
+    for _ in range(lod):
+        n >>= 1
+        if a >= n:
+            a, pos = a - n, 0
+        elif b >= n:
+            b, pos = b - n, 1
+        elif c >= n:
+            c, pos = c - n, 2
+        else:
+            a, b, c, pos = n - a, n - b, n - c, 3
+            is_south = not is_south
+        path = (path << 2) | pos
+    return pack_face_idx(lod, d20, path << ((23 - lod) * 2), is_south), (a, b, c).index(1)
+
+
+def faces_around_vertex(vertex_idx: VertexIdx, lod: int) -> Tuple[FaceIdx, ...]:
+    '''
+    Returns the faces at the given LOD that share the given vertex, in CCW order around it (seen
+    from outside the sphere). There are 6, except at the 12 icosahedron vertices, which have 5.
+    This works from the indices alone, with find_neighbor() hops.
+    '''
+    start, k = _get_incident_face(vertex_idx, lod)
+
+    # The vertex is corner V(k). The next face CCW is across the edge from V(k) to V(k+2), which is
+    # edge k+1. On the far side, the vertex is that edge's V(ne+1).
+    result = [start]
+    face, edge = find_neighbor(start, (k + 1) % 3)
+    while face != start:
+        result.append(face)
+        k = (edge + 1) % 3
+        face, edge = find_neighbor(face, (k + 1) % 3)
+    return tuple(result)
+
+
+__all__ = ["UNOWNED_D20", "face_vertices", "faces_around_vertex", "vertex_position"]
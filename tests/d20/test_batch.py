@@ -0,0 +1,165 @@
+import math
+import random
+import pytest
+from delta20.geometry import locate_lat_long
+from delta20.packing import build_path, pack_face_idx
+from delta20.indexing import find_neighbor, face_idx_to_str
+from testutils import faces_at, random_face
+
+np = pytest.importorskip("numpy")
+from delta20.batch import find_neighbors_batch, locate_many  # noqa: E402
+
+
+def _all_faces(max_lod):
+    # Every face on the globe, up to and including max_lod.
+    return [face for lod in range(max_lod + 1) for face in faces_at(lod)]
+
+
+def _random_faces(count, seed):
+    rng = random.Random(seed)
+    return [random_face(rng, rng.randint(0, 22)) for _ in range(count)]
+
+
+def _assert_matches_scalar(faces):
+    ids = np.array(faces, dtype=np.uint64)
+    for edge in range(3):
+        nbrs, nbr_edges = find_neighbors_batch(ids, edge)
+        for f, n, ne in zip(faces, nbrs.tolist(), nbr_edges.tolist()):
+            expected, expected_edge = find_neighbor(f, edge)
+            assert n == expected, f"{face_idx_to_str(f)} over edge {edge}:\nfound:\t\t{face_idx_to_str(n)}\n" \
+                f"expected:\t{face_idx_to_str(expected)}"
+            assert ne == expected_edge
+
+
+def test_batch_matches_scalar_exhaustive():
+    _assert_matches_scalar(_all_faces(4))
+
+
+def test_batch_matches_scalar_random_deep():
+    _assert_matches_scalar(_random_faces(2000, 0xBA7C4))
+
+
+def test_batch_mixed_edges_and_shape():
+    faces = _random_faces(60, 7)
+    ids = np.array(faces, dtype=np.uint64).reshape(3, 20)
+    edges = (np.arange(60, dtype=np.uint8) % 3).reshape(3, 20)
+    nbrs, nbr_edges = find_neighbors_batch(ids, edges)
+    assert nbrs.shape == (3, 20) and nbrs.dtype == np.uint64
+    for f, e, n, ne in zip(faces, edges.ravel().tolist(), nbrs.ravel().tolist(), nbr_edges.ravel().tolist()):
+        assert (n, ne) == find_neighbor(f, e)
+
+    # Round trip: hopping back over the return edges lands on the originals.
+    back, back_edges = find_neighbors_batch(nbrs, nbr_edges)
+    assert (back == ids).all()
+    assert (back_edges == edges).all()
+
+
+def test_batch_rejects_bad_edges():
+    with pytest.raises(ValueError):
+        find_neighbors_batch(np.zeros(4, dtype=np.uint64), 3)
+
+
+def test_locate_many_matches_scalar():
+    rng = np.random.default_rng(0x10CA7E)
+    lat = np.arcsin(rng.uniform(-1.0, 1.0, 3000))
+    lon = rng.uniform(-math.pi, math.pi, 3000)
+    # Include the poles and a few points on d20 edges and corners.
+    lat[:4] = (math.pi / 2, -math.pi / 2, 0.0, math.atan(0.5))
+    lon[:4] = (0.0, 0.0, 0.0, 0.0)
+    for lod in (0, 1, 7, 22):
+        found = locate_many(lat, lon, lod, chunk_size=700, threads=3)
+        assert found.dtype == np.uint64 and found.shape == lat.shape
+        assert found.tolist() == [locate_lat_long(a, o, lod) for a, o in zip(lat.tolist(), lon.tolist())]
+
+
+def test_locate_many_shapes_and_errors():
+    lat = np.zeros((2, 3))
+    assert locate_many(lat, 0.5, 4).shape == (2, 3)
+    assert locate_many(np.zeros(0), np.zeros(0), 4).shape == (0,)
+    with pytest.raises(ValueError):
+        locate_many(lat, 0.5, 23)
+
+
+def test_popcount_fallback(monkeypatch):
+    import delta20.batch as batch
+    values = np.array([0, 1, 0b1011, 2 ** 64 - 1, 0x5555555555555555, 12345678901234567], dtype=np.uint64)
+    expected = [bin(v).count("1") for v in values.tolist()]
+    assert batch._popcount(values).tolist() == expected
+    monkeypatch.setattr(batch, "_bitwise_count", None)
+    assert batch._popcount(values).tolist() == expected
+
+
+def test_pack_and_unpack_many():
+    from delta20.batch import pack_many, unpack_many
+    from delta20.packing import unpack_face_idx
+    faces = _random_faces(2000, 0x20)
+    fields = [unpack_face_idx(f) for f in faces]
+    lod, d20, path, south = (np.array(column) for column in zip(*fields))
+    # Without is_south, the polarity is recounted, and matches the scalar count.
+    assert pack_many(lod, d20, path).tolist() == faces
+    assert pack_many(lod, d20, path, ~south).tolist() == [f ^ 1 for f in faces]
+    unpacked = unpack_many(np.array(faces, dtype=np.uint64))
+    assert unpacked["lod"].tolist() == lod.tolist() and unpacked["d20"].tolist() == d20.tolist()
+    assert unpacked["path"].tolist() == path.tolist() and unpacked["is_south"].tolist() == south.tolist()
+    # Scalars broadcast.
+    assert pack_many(3, np.arange(20), build_path(1, 2, 3)).tolist() == \
+        [pack_face_idx(3, d, build_path(1, 2, 3)) for d in range(20)]
+    for bad in ((23, 0, 0), (0, 20, 0), (1, 0, 1 << 46)):
+        with pytest.raises(ValueError):
+            pack_many(*bad)
+
+
+def test_build_paths():
+    from delta20.batch import build_paths
+    rng = np.random.default_rng(3)
+    for lod in (0, 1, 7, 23):
+        digits = rng.integers(0, 4, (50, lod))
+        assert build_paths(digits).tolist() == [build_path(*row) if lod else 0 for row in digits.tolist()]
+    with pytest.raises(ValueError):
+        build_paths(np.full((2, 3), 4))
+    with pytest.raises(ValueError):
+        build_paths(np.zeros((2, 24), dtype=int))
+
+
+def test_path_strings():
+    from delta20.batch import format_paths, pack_many, parse_paths
+    from delta20.packing import unpack_face_idx
+    faces = _random_faces(2000, 0x5)
+    strings = format_paths(np.array(faces, dtype=np.uint64))
+    for f, s in zip(faces, strings.tolist()):
+        lod, _, path, _ = unpack_face_idx(f)
+        assert s == "".join(str((path >> (2 * (22 - k))) & 0b11) for k in range(lod))
+        assert build_path(s) == path if s else path == 0
+    lod, paths = parse_paths(strings)
+    d20 = [unpack_face_idx(f)[1] for f in faces]
+    assert pack_many(lod, d20, paths).tolist() == faces
+    assert format_paths(np.array([[faces[0]]], dtype=np.uint64)).shape == (1, 1)
+    for bad in (["0124"], ["1x"], ["0" * 24]):
+        with pytest.raises(ValueError):
+            parse_paths(bad)
+
+
+def test_iter_cells():
+    from delta20.batch import iter_cells
+    from delta20.packing import children
+    # The whole globe, in sorted FaceIdx order, however it is chunked.
+    expected = sorted(face for face in _all_faces(3) if face >> 59 == 3)
+    for chunk_size in (1, 7, 64, 1 << 20):
+        chunks = list(iter_cells(3, chunk_size=chunk_size))
+        assert all(0 < len(chunk) <= chunk_size and chunk.dtype == np.uint64 for chunk in chunks)
+        assert np.concatenate(chunks).tolist() == expected
+
+    # A subtree, including the root itself.
+    root = pack_face_idx(2, 13, build_path(3, 1))
+    under = [root]
+    for _ in range(3):
+        under = [kid for face in under for kid in children(face)]
+    assert np.concatenate(list(iter_cells(5, root, chunk_size=10))).tolist() == sorted(under)
+    assert np.concatenate(list(iter_cells(2, root))).tolist() == [root]
+
+    with pytest.raises(ValueError):
+        next(iter_cells(1, root))
+    with pytest.raises(ValueError):
+        next(iter_cells(23))
+    with pytest.raises(ValueError):
+        next(iter_cells(3, order="hilbert"))
@@ -0,0 +1,88 @@
+import random
+import pytest
+from delta20.packing import build_path, children, is_ancestor, pack_face_idx, parent
+from testutils import random_face
+
+np = pytest.importorskip("numpy")
+from delta20.cellunion import CellUnion  # noqa: E402
+
+
+def _random_union(rng, count):
+    # Cells clustered on a few d20 faces and shallow LODs, so unions overlap and nest a lot.
+    return [random_face(rng, rng.randint(0, 4), d20_count=3) for _ in range(count)]
+
+
+def _expand(cells, lod):
+    # The set of LOD 'lod' descendants of the cells, as a brute-force model of the covered area.
+    result = set()
+    work = list(cells)
+    while work:
+        cell = work.pop()
+        if (cell >> 59) == lod:
+            result.add(cell)
+        else:
+            work.extend(children(cell))
+    return result
+
+
+def test_normalization():
+    cell = pack_face_idx(2, 7, build_path(1, 3))
+    # Four siblings become their parent, and covered cells and duplicates disappear.
+    assert list(CellUnion(children(cell))) == [cell]
+    assert list(CellUnion([cell, children(cell)[2], children(children(cell)[3])[0], cell])) == [cell]
+    # The merge carries on up the hierarchy.
+    grandchildren = [g for c in children(cell) for g in children(c)]
+    assert list(CellUnion(grandchildren)) == [cell]
+    # Without one grandchild, three children stay whole and the fourth keeps its three children.
+    assert set(CellUnion(grandchildren[:-1])) == set(children(cell)[:3]) | set(grandchildren[12:15])
+    # LOD-0 faces are never merged.
+    assert len(CellUnion([pack_face_idx(0, d20, 0) for d20 in range(20)])) == 20
+    assert len(CellUnion()) == 0
+
+
+def test_normalized_form_is_unique():
+    rng = random.Random(0xCE11)
+    for _ in range(50):
+        cells = _random_union(rng, 30)
+        union = CellUnion(cells)
+        assert _expand(union, 5) == _expand(cells, 5)
+        assert CellUnion(_expand(cells, 5)) == union
+        assert all(not is_ancestor(a, b) for a in union for b in union if a != b)
+        assert not any(set(children(parent(c))) <= set(union) for c in union if c >> 59)
+
+
+def test_contains_and_intersects():
+    rng = random.Random(0xC0)
+    for _ in range(20):
+        union = CellUnion(_random_union(rng, 20))
+        queries = [random_face(rng, rng.randint(0, 5), d20_count=3) for _ in range(100)]
+        covered = _expand(union, 6)
+        contains = union.contains(np.array(queries, dtype=np.uint64))
+        intersects = union.intersects(np.array(queries, dtype=np.uint64))
+        for q, c, i in zip(queries, contains.tolist(), intersects.tolist()):
+            area = _expand([q], 6)
+            assert c == (area <= covered) == union.contains(q) == (q in union)
+            assert i == bool(area & covered) == union.intersects(q)
+
+
+def test_set_operations():
+    rng = random.Random(0x5E7)
+    for _ in range(30):
+        a, b = _random_union(rng, 20), _random_union(rng, 20)
+        ua, ub = CellUnion(a), CellUnion(b)
+        ea, eb = _expand(a, 5), _expand(b, 5)
+        assert _expand(ua | ub, 5) == ea | eb
+        assert _expand(ua & ub, 5) == ea & eb
+        assert _expand(ua - ub, 5) == ea - eb
+        for result in (ua | ub, ua & ub, ua - ub):
+            assert result == CellUnion(result)
+
+
+def test_range_keys_round_trip():
+    rng = random.Random(0xA11)
+    union = CellUnion(_random_union(rng, 100))
+    keys = union.range_keys
+    assert np.all(keys[1:] > keys[:-1])
+    assert CellUnion.from_range_keys(keys) == union
+    with pytest.raises(ValueError):
+        keys[0] = 0
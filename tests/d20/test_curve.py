@@ -0,0 +1,60 @@
+import random
+import pytest
+from delta20.curve import _D20_CURVE, curve_key, from_curve_key
+from delta20.packing import build_path, is_ancestor, pack_face_idx
+from delta20.precomputed.canonical_d20 import CANONICAL_FACES, CANONICAL_FACES_INDEXED
+from delta20.vertices import face_vertices
+from testutils import faces_at
+
+
+def test_round_trip():
+    rng = random.Random(25)
+    for _ in range(2000):
+        lod = rng.randrange(23)
+        face = pack_face_idx(lod, rng.randrange(20), rng.getrandbits(2 * lod) << (46 - 2 * lod))
+        key = curve_key(face)
+        assert key >> 59 == lod and key & 0xFF == 0
+        assert from_curve_key(key) == face
+    with pytest.raises(ValueError):
+        from_curve_key(20 << 54)
+    for bad in (20 << 54, 23 << 59):
+        with pytest.raises(ValueError):
+            curve_key(bad)
+
+
+def test_d20_chain():
+    # Every d20 face once, each entered where the previous one was left (looping around), across a
+    # shared edge.
+    assert sorted(d20 for d20, _, _ in _D20_CURVE) == list(range(20))
+    corners = [CANONICAL_FACES[fi] for fi in CANONICAL_FACES_INDEXED]
+    for (a, _, exit_corner), (b, entry, _) in zip(_D20_CURVE, _D20_CURVE[1:] + _D20_CURVE[:1]):
+        assert corners[a][exit_corner] == corners[b][entry]
+        assert len(set(corners[a]) & set(corners[b])) == 2
+
+
+@pytest.mark.parametrize("lod", [1, 2, 4])
+def test_continuity(lod):
+    # Along the curve, every face touches the next, and the faces under any face are one run.
+    faces = sorted(faces_at(lod), key=curve_key)
+    for a, b in zip(faces, faces[1:] + faces[:1]):
+        assert set(face_vertices(a)) & set(face_vertices(b))
+    keys = sorted(curve_key(f) for f in faces)
+    assert [from_curve_key(k) for k in keys] == faces
+    root = pack_face_idx(1, 6, build_path(3))
+    run = [i for i, face in enumerate(faces) if is_ancestor(root, face)]
+    assert run == list(range(run[0], run[0] + 4 ** (lod - 1)))
+
+
+def test_batch():
+    np = pytest.importorskip("numpy")
+    from delta20.batch import curve_keys, from_curve_keys, iter_cells
+    faces = faces_at(3) + [pack_face_idx(22, 19, ((1 << 44) - 1) << 2), pack_face_idx(0, 7, 0)]
+    keys = curve_keys(np.array(faces, dtype=np.uint64))
+    assert keys.tolist() == [curve_key(f) for f in faces]
+    assert from_curve_keys(keys).tolist() == faces
+
+    along = np.concatenate(list(iter_cells(3, order="curve", chunk_size=50))).tolist()
+    assert along == sorted(faces_at(3), key=curve_key)
+    root = pack_face_idx(1, 6, build_path(3))
+    under = np.concatenate(list(iter_cells(3, root, order="curve"))).tolist()
+    assert under == [f for f in along if is_ancestor(root, f)]
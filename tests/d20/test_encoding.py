@@ -0,0 +1,63 @@
+import random
+import pytest
+from testutils import random_face
+
+np = pytest.importorskip("numpy")
+from delta20.batch import locate_many  # noqa: E402
+from delta20.encoding import _decode_varints, _encode_varints, decode_cells, encode_cells  # noqa: E402
+
+
+def _random_faces(count, seed):
+    rng = random.Random(seed)
+    return sorted(random_face(rng, rng.choice([0, 1, 5, 14, 22])) for _ in range(count))
+
+
+def _decode(buf, **kwargs):
+    chunks = list(decode_cells(buf, **kwargs))
+    return np.concatenate(chunks).tolist() if chunks else []
+
+
+def test_varints():
+    values = np.array([0, 1, 127, 128, 300, 2 ** 35 + 5, 2 ** 63, 2 ** 64 - 1], dtype=np.uint64)
+    encoded = _encode_varints(values)
+    assert encoded[:5].tolist() == [0, 1, 127, 0x80, 0x01]
+    assert len(encoded) == 1 + 1 + 1 + 2 + 2 + 6 + 10 + 10
+    assert np.array_equal(_decode_varints(encoded), values)
+
+
+def test_round_trip():
+    faces = _random_faces(3000, 0x19)
+    faces += faces[:50]
+    faces.sort()
+    buf = encode_cells(faces)
+    assert _decode(buf) == faces
+    # The decoder streams, so chunks that split varints and groups give the same faces.
+    assert _decode(buf, chunk_size=7) == faces
+    assert _decode(encode_cells(np.array(faces, dtype=np.uint64))) == faces
+    assert encode_cells([]) == b"" and _decode(b"") == []
+
+
+def test_density():
+    rng = np.random.default_rng(5)
+    # Points clustered in a 10x10 degree box, so that the LOD-14 cells are close together.
+    lat = np.radians(rng.uniform(20, 30, 100000))
+    lon = np.radians(rng.uniform(0, 10, 100000))
+    cells = np.unique(locate_many(lat, lon, 14))
+    buf = encode_cells(cells)
+    # (The same number of cells scattered over the globe takes about 2.6 bytes each.)
+    assert len(buf) < 2 * len(cells)
+    assert np.array_equal(np.concatenate(list(decode_cells(buf))), cells)
+
+
+def test_invalid():
+    faces = _random_faces(100, 7)
+    with pytest.raises(ValueError):
+        encode_cells(faces[::-1])
+    buf = encode_cells(faces)
+    with pytest.raises(ValueError):
+        _decode(buf[:-1])
+    with pytest.raises(ValueError):
+        _decode(buf + b"\x80")
+    with pytest.raises(ValueError):
+        # A header for d20 face 25.
+        _decode(bytes([25, 1, 0]))
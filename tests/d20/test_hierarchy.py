@@ -0,0 +1,108 @@
+import random
+import pytest
+from delta20.indexing import find_neighbor
+from delta20.packing import (ancestor, build_path, child_position, children, from_range_key, get_pos,
+                             is_ancestor, pack_face_idx, parent, range_max, range_min, to_range_key,
+                             unpack_face_idx)
+from testutils import random_face
+
+
+def _repack(face_idx):
+    # The same face, with the polarity recounted from scratch.
+    lod, d20, path, _ = unpack_face_idx(face_idx)
+    return pack_face_idx(lod, d20, path)
+
+
+def test_children_and_parent():
+    rng = random.Random(0x1E4)
+    for _ in range(500):
+        cell = random_face(rng, rng.randint(0, 21))
+        lod, d20, path, _ = unpack_face_idx(cell)
+        kids = children(cell)
+        for pos, kid in enumerate(kids):
+            assert kid == pack_face_idx(lod + 1, d20, path | (pos << (2 * (22 - lod))))
+            assert parent(kid) == cell
+            assert child_position(kid) == pos
+            assert child_position(kid) == get_pos(unpack_face_idx(kid)[2], lod)
+
+
+def test_ancestors():
+    rng = random.Random(0xA4C)
+    for _ in range(300):
+        cell = random_face(rng, rng.randint(0, 22))
+        lod, d20, path, _ = unpack_face_idx(cell)
+        walked = cell
+        for level in range(lod, -1, -1):
+            assert ancestor(cell, level) == walked == _repack(walked)
+            assert is_ancestor(walked, cell)
+            assert not is_ancestor(cell, walked) or level == lod
+            if level:
+                walked = parent(walked)
+
+
+def test_is_ancestor_rejects_strangers():
+    a = pack_face_idx(2, 5, build_path(1, 3))
+    assert is_ancestor(a, pack_face_idx(4, 5, build_path(1, 3, 0, 2)))
+    assert not is_ancestor(a, pack_face_idx(4, 5, build_path(1, 2, 0, 2)))
+    assert not is_ancestor(a, pack_face_idx(4, 6, build_path(1, 3, 0, 2)))
+    assert not is_ancestor(a, pack_face_idx(1, 5, build_path(1)))
+
+
+def test_hierarchy_bounds():
+    with pytest.raises(ValueError):
+        parent(pack_face_idx(0, 3, 0))
+    with pytest.raises(ValueError):
+        child_position(pack_face_idx(0, 3, 0))
+    with pytest.raises(ValueError):
+        children(pack_face_idx(22, 3, 0))
+    with pytest.raises(ValueError):
+        ancestor(pack_face_idx(4, 3, 0), 5)
+
+
+def test_range_key_round_trip():
+    rng = random.Random(0x4A6E)
+    for _ in range(500):
+        cell = random_face(rng, rng.randint(0, 22))
+        key = to_range_key(cell)
+        assert 0 < key < (1 << 64)
+        assert from_range_key(key) == cell
+        assert range_min(cell) <= key <= range_max(cell)
+
+
+def test_range_keys_bound_exactly_the_descendants():
+    rng = random.Random(0x5CA)
+    for _ in range(50):
+        root = random_face(rng, rng.randint(0, 19))
+        lo, hi = range_min(root), range_max(root)
+        # Every descendant is in range, including the deepest ones at the range's two ends.
+        for kid in children(root):
+            assert lo <= range_min(kid) and range_max(kid) <= hi
+            for grandkid in children(kid):
+                assert lo <= to_range_key(grandkid) <= hi
+        deepest = root
+        while unpack_face_idx(deepest)[0] < 22:
+            deepest = children(deepest)[3]
+        assert lo <= to_range_key(deepest) <= hi
+        # Neighbors, and their own descendants, are not.
+        for edge in range(3):
+            nbr = find_neighbor(root, edge)[0]
+            assert range_max(nbr) < lo or hi < range_min(nbr)
+
+
+def test_range_keys_sort_subtrees_contiguously():
+    rng = random.Random(42)
+    cells = set()
+    for _ in range(2000):
+        cells.add(random_face(rng, rng.randint(0, 6)))
+    root = random_face(rng, 2)
+    by_key = sorted(cells, key=to_range_key)
+    inside = [is_ancestor(root, c) for c in by_key]
+    if any(inside):
+        first, last = inside.index(True), len(inside) - 1 - inside[::-1].index(True)
+        assert all(inside[first:last + 1])
+
+
+def test_from_range_key_rejects_bad_keys():
+    for bad in (0, 1 << 13, (20 << 59) | (1 << 58), 1 << 57):
+        with pytest.raises(ValueError):
+            from_range_key(bad)
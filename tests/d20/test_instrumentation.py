@@ -0,0 +1,60 @@
+import delta20
+from delta20 import indexing, instrumentation, mesh
+from delta20.indexing import find_neighbor
+from delta20.packing import build_path, pack_face_idx
+
+
+def test_enable_disable():
+    original = indexing.find_neighbor
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        assert instrumentation.is_enabled()
+        assert indexing.find_neighbor is not original and mesh.find_neighbor is indexing.find_neighbor
+        face = pack_face_idx(4, 7, build_path(0, 1, 2, 0))
+        for edge in range(3):
+            assert indexing.find_neighbor(face, edge) == find_neighbor(face, edge)
+        indexing.k_ring(face, 2)
+    finally:
+        instrumentation.disable()
+    assert not instrumentation.is_enabled()
+    assert indexing.find_neighbor is original and mesh.find_neighbor is original
+
+    counts = instrumentation.snapshot()
+    assert counts["calls"]["k_ring"] == 1
+    assert counts["calls"]["find_neighbor"] >= 3 and counts["seconds"]["find_neighbor"] > 0
+    # In a mypyc build, k_ring()'s own calls to find_neighbor() are bound directly, and not counted.
+    if delta20.BACKEND != "mypyc":
+        assert counts["calls"]["find_neighbor"] > 3
+    assert sum(counts["find_neighbor"]["ascents"]) == counts["calls"]["find_neighbor"]
+
+    # Disabled, nothing more is counted.
+    indexing.k_ring(pack_face_idx(4, 7, 0), 2)
+    assert instrumentation.snapshot() == counts
+    instrumentation.reset()
+    assert instrumentation.snapshot()["calls"]["find_neighbor"] == 0
+
+
+def test_ascents():
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        # 0120 turns on its last digit over edge 0 (1 level), on the 2 over edge 2 (2 levels), and
+        # on the 1 over edge 1 (3 levels).
+        face = pack_face_idx(4, 7, build_path(0, 1, 2, 0))
+        for edge in range(3):
+            indexing.find_neighbor(face, edge)
+        # A LOD-0 face always crosses, ascending no levels.
+        indexing.find_neighbor(pack_face_idx(0, 3, 0), 2)
+    finally:
+        instrumentation.disable()
+    counts = instrumentation.snapshot()["find_neighbor"]
+    assert counts["ascents"] == [1, 1, 1, 1]
+    assert counts["d20_crossings"] == 1
+
+    text = instrumentation.to_prometheus()
+    assert 'delta20_calls_total{function="find_neighbor"} 4' in text
+    assert 'delta20_find_neighbor_ascents_total{levels="3"} 1' in text
+    assert "delta20_find_neighbor_d20_crossings_total 1" in text
+    assert "# TYPE delta20_seconds_total counter" in text
+    instrumentation.reset()
@@ -0,0 +1,184 @@
+import random
+import pytest
+from delta20.geometry import get_cross_product, get_dot_product, get_face_vertices
+from delta20.indexing import find_neighbor
+from delta20.mesh import AdaptiveMesh, find_leaf_neighbors
+from delta20.packing import children, pack_face_idx, parent, unpack_face_idx
+
+
+def _assert_tiles_globe(mesh):
+    # The leaves cover 20 d20 faces' worth of area, and none is inside another.
+    leaves = mesh.leaves
+    assert sum(4.0 ** -unpack_face_idx(f)[0] for f in leaves) == pytest.approx(20.0)
+    for f in leaves:
+        g = f
+        while unpack_face_idx(g)[0] > 0:
+            g = parent(g)
+            assert g not in leaves
+
+
+def _random_leaf(mesh, rng, max_lod):
+    return rng.choice([f for f in sorted(mesh.leaves) if unpack_face_idx(f)[0] < max_lod])
+
+
+def test_refine_keeps_balance():
+    mesh = AdaptiveMesh()
+    assert len(mesh) == 20
+    # Refining one face deep, next to a d20 corner, forces a graded halo around it.
+    face = pack_face_idx(0, 3, 0)
+    for _ in range(8):
+        before = mesh.leaves
+        added, removed = mesh.refine([face])
+        assert set(added) == mesh.leaves - before
+        assert set(removed) == before - mesh.leaves
+        assert set(children(face)) <= set(added)
+        face = children(face)[0]
+    assert mesh.is_balanced()
+    assert len({unpack_face_idx(f)[1] for f in mesh.leaves if unpack_face_idx(f)[0] >= 2}) > 1
+    _assert_tiles_globe(mesh)
+
+
+def test_refine_skips_finest_lod():
+    mesh = AdaptiveMesh()
+    deep = pack_face_idx(0, 3, 0)
+    for _ in range(22):
+        mesh.refine([deep])
+        deep = children(deep)[0]
+    assert deep in mesh and unpack_face_idx(deep)[0] == 22
+    # LOD-22 leaves cannot split, and are skipped like non-leaves, without undoing the others.
+    other = pack_face_idx(0, 17, 0)
+    before = mesh.leaves
+    added, removed = mesh.refine([other, deep])
+    assert removed == [other] and set(added) == mesh.leaves - before
+    assert deep in mesh and mesh.is_balanced()
+    assert mesh.refine([deep]) == ([], [])
+
+
+def test_random_refine_and_coarsen():
+    rng = random.Random(0x2A1)
+    mesh = AdaptiveMesh()
+    for step in range(60):
+        before = mesh.leaves
+        if step % 3 == 2:
+            added, removed = mesh.coarsen(rng.sample(sorted(mesh.leaves), 20))
+        else:
+            added, removed = mesh.refine([_random_leaf(mesh, rng, 9) for _ in range(3)])
+        assert set(added) == mesh.leaves - before
+        assert set(removed) == before - mesh.leaves
+        assert mesh.is_balanced()
+        assert mesh.max_lod == max(f >> 59 for f in mesh.leaves)
+    _assert_tiles_globe(mesh)
+
+
+def test_coarsen():
+    mesh = AdaptiveMesh()
+    d20_face = pack_face_idx(0, 5, 0)
+    kids = children(d20_face)
+    mesh.refine([d20_face])
+    mesh.refine([kids[2]])
+    # Merging the children back undoes the refinement.
+    assert mesh.coarsen([children(kids[2])[1]]) == ([kids[2]], sorted(children(kids[2])))
+    # Nothing to merge: a sibling is not a leaf, or the face is at LOD 0.
+    mesh.refine([kids[2]])
+    mesh.refine([children(kids[2])[0]])
+    assert mesh.coarsen([children(kids[2])[1]]) == ([], [])
+    assert mesh.coarsen([pack_face_idx(0, 0, 0)]) == ([], [])
+
+    # Merging the center's children would leave it two LODs coarser than the grandchildren of the
+    # corner next to it, so that merge is refused.
+    mesh = AdaptiveMesh()
+    mesh.refine([d20_face])
+    mesh.refine([kids[3], kids[0]])
+    mesh.refine([children(kids[0])[1]])
+    assert mesh.is_balanced()
+    assert mesh.coarsen(children(kids[3])) == ([], [])
+    # Once the corner is coarsened, the center can follow.
+    mesh.coarsen(children(children(kids[0])[1]))
+    assert mesh.coarsen(children(kids[3])) == ([kids[3]], sorted(children(kids[3])))
+    assert mesh.is_balanced()
+
+
+def test_balance_on_construction():
+    leaves = [pack_face_idx(0, d20, 0) for d20 in range(1, 20)]
+    leaves += [f for c in children(pack_face_idx(0, 0, 0)) for f in children(c)]
+    mesh = AdaptiveMesh(leaves)
+    assert mesh.is_balanced()
+    assert len(mesh) > len(leaves)
+    _assert_tiles_globe(mesh)
+
+
+def _edge_faces(face_idx, edge, lod):
+    # The descendants of a face at the given LOD along one of its edges, from V(edge+1) to V(edge+2).
+    if unpack_face_idx(face_idx)[0] == lod:
+        return [face_idx]
+    kids = children(face_idx)
+    return _edge_faces(kids[(edge + 1) % 3], edge, lod) + _edge_faces(kids[(edge + 2) % 3], edge, lod)
+
+
+def _on_great_circle(p, u, v):
+    n = get_cross_product(u, v)
+    return abs(get_dot_product(p, n)) < 1e-9
+
+
+@pytest.mark.parametrize("balanced", [True, False])
+def test_find_leaf_neighbors(balanced):
+    rng = random.Random(0x15 + balanced)
+    if balanced:
+        mesh = AdaptiveMesh()
+        for _ in range(40):
+            mesh.refine([_random_leaf(mesh, rng, 7)])
+        leaves = mesh.leaves
+    else:
+        # Unbalanced meshes work too: refine without the halo.
+        leaves = {pack_face_idx(0, d20, 0) for d20 in range(20)}
+        for _ in range(40):
+            leaf = rng.choice(sorted(f for f in leaves if unpack_face_idx(f)[0] < 7))
+            leaves.remove(leaf)
+            leaves.update(children(leaf))
+    max_lod = max(unpack_face_idx(f)[0] for f in leaves)
+
+    for face_idx in leaves:
+        for edge in range(3):
+            found = find_leaf_neighbors(face_idx, edge, leaves, max_lod)
+            # The leaves over each finest-LOD piece of the edge, deduplicated in order.
+            expected = []
+            for piece in _edge_faces(face_idx, edge, max_lod):
+                g = find_neighbor(piece, edge)[0]
+                while g not in leaves:
+                    g = parent(g)
+                if not expected or expected[-1] != g:
+                    expected.append(g)
+            assert [f for f, _ in found] == expected
+            if balanced:
+                assert mesh.find_leaf_neighbors(face_idx, edge) == found
+                assert 1 <= len(found) <= 2
+            a, b, c = get_face_vertices(face_idx)
+            u, v = ((a, b, c)[(edge + 1) % 3], (a, b, c)[(edge + 2) % 3])
+            for nbr, nbr_edge in found:
+                corners = get_face_vertices(nbr)
+                assert _on_great_circle(corners[(nbr_edge + 1) % 3], u, v)
+                assert _on_great_circle(corners[(nbr_edge + 2) % 3], u, v)
+                assert face_idx in [f for f, _ in find_leaf_neighbors(nbr, nbr_edge, leaves, max_lod)]
+
+
+def test_find_leaf_neighbors_outside_leaves():
+    leaves = {pack_face_idx(0, d20, 0) for d20 in range(20)}
+    inner = children(children(pack_face_idx(0, 4, 0))[3])[0]
+    # The face is inside a leaf; the edge is no boundary between leaves.
+    assert find_leaf_neighbors(inner, 0, leaves, 0) == []
+
+
+def test_find_leaf_neighbors_uncovered_edge():
+    # Leaves that do not cover the edge (an empty or partial set) end the search at max_lod,
+    # rather than at LOD 22.
+    face = children(children(children(pack_face_idx(0, 4, 0))[1])[2])[0]
+    assert find_leaf_neighbors(face, 1, set(), 0) == []
+    partial = {children(pack_face_idx(0, 7, 0))[3]}
+    for edge in range(3):
+        assert find_leaf_neighbors(face, edge, partial, 1) == []
+        # A finer max_lod than the set's only makes the search go deeper.
+        assert find_leaf_neighbors(face, edge, partial, 8) == []
+    # A partial set that does reach the edge still returns what it has.
+    nbr, nbr_edge = find_neighbor(face, 1)
+    kid = children(nbr)[(nbr_edge + 2) % 3]
+    assert find_leaf_neighbors(face, 1, {kid}, 4) == [(kid, nbr_edge)]
@@ -1,5 +1,6 @@
+import random
 import pytest
-from testutils import get_canonicals, undirected_edge_key
+from testutils import get_canonicals, undirected_edge_key, walk_find_neighbor
 from delta20.packing import pack_face_idx, unpack_face_idx
 from delta20.indexing import find_neighbor, build_path, face_idx_to_str, FaceIdx
 from delta20.precomputed.canonical_d20 import CANONICAL_FACES_INDEXED
@@ -164,3 +165,28 @@ def test_find_neighbors_calculated_by_hand():
     test(2202, "0020", 1)
     test(2220, "0002", 1)
     test(2222, "0000", 1)
+
+
+def test_find_neighbor_matches_walk_exhaustive():
+    # Every edge of every face on the globe, up to LOD 5.
+    for d20 in range(20):
+        for lod in range(0, 6):
+            for i in range(4 ** lod):
+                digits = [(i >> (2 * k)) & 0b11 for k in reversed(range(lod))]
+                start = pack_face_idx(lod, d20, build_path(*digits) if digits else 0)
+                for edge in range(3):
+                    assert find_neighbor(start, edge) == walk_find_neighbor(start, edge), \
+                        f"{face_idx_to_str(start)} over edge {edge}"
+
+
+def test_find_neighbor_matches_walk_random_deep():
+    rng = random.Random(0x0D20)
+    for _ in range(5000):
+        lod = rng.randint(6, 22)
+        # Favor long runs of edge-hugging digits, which are the deep descents and d20 crossings.
+        edge = rng.randint(0, 2)
+        along = [d for d in range(3) if d != edge]
+        digits = [rng.choice(along) if rng.random() < 0.8 else rng.randint(0, 3) for _ in range(lod)]
+        start = pack_face_idx(lod, rng.randint(0, 19), build_path(*digits))
+        assert find_neighbor(start, edge) == walk_find_neighbor(start, edge), \
+            f"{face_idx_to_str(start)} over edge {edge}"
@@ -0,0 +1,101 @@
+import heapq
+import math
+import random
+import pytest
+from delta20.indexing import _get_center_angle, find_neighbor, find_path, find_path_hierarchical
+from delta20.packing import build_path, pack_face_idx
+from testutils import random_face
+
+
+def _dijkstra_cost(start, target, weight):
+    costs, queue, done = {start: 0.0}, [(0.0, start)], set()
+    while queue:
+        cost, face = heapq.heappop(queue)
+        if face == target:
+            return cost
+        if face in done:
+            continue
+        done.add(face)
+        for edge in range(3):
+            nbr = find_neighbor(face, edge)[0]
+            nbr_cost = cost + weight(face, nbr)
+            if nbr_cost < costs.get(nbr, math.inf):
+                costs[nbr] = nbr_cost
+                heapq.heappush(queue, (nbr_cost, nbr))
+    return math.inf
+
+
+def _assert_valid_path(path, start, target):
+    assert path[0] == start and path[-1] == target
+    for a, b in zip(path, path[1:]):
+        assert b in [find_neighbor(a, e)[0] for e in range(3)]
+
+
+def test_find_path_is_optimal():
+    rng = random.Random(0xA57A)
+    for _ in range(20):
+        lod = rng.randint(0, 5)
+        start, target = random_face(rng, lod), random_face(rng, lod)
+        path, cost = find_path(start, target)
+        _assert_valid_path(path, start, target)
+        # The default weights are the angles between the centers, and the result is the cheapest.
+        no_estimate = find_path(start, target, distance_heuristic=lambda a, b: 0.0)[1]
+        assert cost == pytest.approx(no_estimate)
+        assert cost == pytest.approx(_dijkstra_cost(start, target, _get_center_angle))
+        assert cost == pytest.approx(sum(_get_center_angle(a, b) for a, b in zip(path, path[1:])))
+
+
+def test_find_path_custom_weights():
+    rng = random.Random(0x4E1)
+    for _ in range(10):
+        start, target = random_face(rng, 4), random_face(rng, 4)
+        # Counting steps instead gives a shortest path in hops.
+        path, cost = find_path(start, target, weight_heuristic=lambda a, b: 1.0,
+                               distance_heuristic=lambda a, b: 0.0)
+        _assert_valid_path(path, start, target)
+        assert cost == len(path) - 1 == _dijkstra_cost(start, target, lambda a, b: 1.0)
+
+
+def test_find_path_edge_cases():
+    face = pack_face_idx(3, 7, build_path(1, 3, 2))
+    assert find_path(face, face) == ([face], 0.0)
+    with pytest.raises(ValueError):
+        find_path(face, pack_face_idx(2, 7, build_path(1, 3)))
+
+    # Walling off the target makes it unreachable.
+    wall = {find_neighbor(face, e)[0] for e in range(3)}
+    start = pack_face_idx(3, 15, build_path(0, 0, 0))
+    assert find_path(start, face, weight_heuristic=lambda a, b: math.inf if b in wall else 1.0) \
+        == ([], math.inf)
+
+
+def test_find_path_hierarchical():
+    rng = random.Random(0x41E)
+    for _ in range(6):
+        lod = rng.randint(4, 6)
+        start, target = random_face(rng, lod), random_face(rng, lod)
+        best = find_path(start, target)[1]
+        for coarse_lod, halo in ((0, 1), (2, 0), (3, 2), (lod, 1)):
+            path, cost = find_path_hierarchical(start, target, coarse_lod, halo)
+            _assert_valid_path(path, start, target)
+            assert cost == pytest.approx(sum(_get_center_angle(a, b) for a, b in zip(path, path[1:])))
+            # Cheaper routes outside the corridor can be missed, but not by much.
+            assert best - 1e-12 <= cost <= best * 1.25
+
+    # The given weights apply to the final pass.
+    start, target = random_face(rng, 6), random_face(rng, 6)
+    path, cost = find_path_hierarchical(start, target, 3, weight_heuristic=lambda a, b: 1.0,
+                                        distance_heuristic=lambda a, b: 0.0)
+    _assert_valid_path(path, start, target)
+    assert cost == len(path) - 1
+
+
+def test_find_path_hierarchical_arguments():
+    face = pack_face_idx(3, 7, build_path(1, 3, 2))
+    other = pack_face_idx(3, 2, build_path(0, 1, 2))
+    with pytest.raises(ValueError):
+        find_path_hierarchical(face, other, 4)
+    with pytest.raises(ValueError):
+        find_path_hierarchical(face, other, 1, halo=-1)
+    with pytest.raises(ValueError):
+        find_path_hierarchical(face, pack_face_idx(2, 7, build_path(1, 3)), 1)
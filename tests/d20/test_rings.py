@@ -0,0 +1,57 @@
+import random
+import pytest
+from delta20.indexing import find_neighbor, k_disk, k_disks, k_ring, k_rings
+from delta20.packing import pack_face_idx
+from testutils import random_face
+
+
+def _naive_distances(center, k):
+    # Plain BFS over all three edges of every cell.
+    dist = {center: 0}
+    frontier = [center]
+    for d in range(1, k + 1):
+        frontier = [n for c in frontier for n in (find_neighbor(c, e)[0] for e in range(3))]
+        frontier = [n for n in dict.fromkeys(frontier) if n not in dist]
+        for n in frontier:
+            dist[n] = d
+    return dist
+
+
+def test_rings_match_naive_bfs():
+    rng = random.Random(0x21)
+    for lod in (0, 1, 3, 9, 22):
+        for _ in range(5):
+            center = random_face(rng, lod)
+            k = rng.randint(0, 8)
+            dist = _naive_distances(center, k)
+            disk = k_disk(center, k)
+            assert len(disk) == len(set(disk))
+            assert set(disk) == set(dist)
+            assert disk[0] == center
+            ring = k_ring(center, k)
+            assert set(ring) == {c for c, d in dist.items() if d == k}
+
+
+def test_d20_rings():
+    # At LOD 0 every face is within 5 hops of every other face, across the whole icosahedron.
+    center = pack_face_idx(0, 0, 0)
+    sizes = [len(k_ring(center, k)) for k in range(7)]
+    assert sizes == [1, 3, 6, 6, 3, 1, 0]
+    assert len(k_disk(center, 6)) == 20
+
+
+def test_rings_in_batch():
+    rng = random.Random(7)
+    centers = [random_face(rng, 12) for _ in range(10)]
+    # Overlapping centers must not starve each other.
+    centers.append(find_neighbor(centers[0], 1)[0])
+    centers.extend(k_disk(centers[1], 2))
+    for center, ring, disk in zip(centers, k_rings(centers, 4), k_disks(centers, 4)):
+        dist = _naive_distances(center, 4)
+        assert set(ring) == {c for c, d in dist.items() if d == 4} and len(ring) == len(set(ring))
+        assert set(disk) == set(dist) and len(disk) == len(dist) and disk[0] == center
+
+
+def test_rings_reject_negative_k():
+    with pytest.raises(ValueError):
+        k_ring(pack_face_idx(0, 0, 0), -1)
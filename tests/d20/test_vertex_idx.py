@@ -0,0 +1,120 @@
+import random
+import pytest
+from delta20.geometry import get_face_vertices
+from delta20.indexing import find_neighbor
+from delta20.packing import build_path, pack_face_idx, pack_vertex_idx, unpack_face_idx, unpack_vertex_idx
+from delta20.precomputed.canonical_d20 import CANONICAL_FACES, CANONICAL_FACES_INDEXED
+from delta20.vertices import UNOWNED_D20, face_vertices, faces_around_vertex, vertex_position
+from testutils import faces_at, random_face, undirected_edge_key
+
+EPS = 1e-12
+
+
+def _close(u, v):
+    return all(abs(p - q) <= EPS for p, q in zip(u, v))
+
+
+def test_d20_face_vertices_are_canonical():
+    for fi in CANONICAL_FACES_INDEXED:
+        assert face_vertices(fi) == CANONICAL_FACES[fi]
+
+
+@pytest.mark.parametrize("lod", [1, 2, 3, 4])
+def test_one_index_per_vertex(lod):
+    positions = {}
+    edges = set()
+    faces = 0
+    for face in faces_at(lod):
+        faces += 1
+        vids = face_vertices(face)
+        for vid, pos in zip(vids, get_face_vertices(face)):
+            if vid in positions:
+                assert _close(positions[vid], pos)
+            positions[vid] = pos
+        for i in range(3):
+            edges.add(undirected_edge_key(vids[i], vids[(i + 1) % 3]))
+
+    # An icosahedral geodesic grid has 10 * 4^lod + 2 vertices, and Euler's formula holds.
+    assert len(positions) == 10 * 4 ** lod + 2
+    assert len(positions) - len(edges) + faces == 2
+
+    # Distinct indices are distinct points.
+    rounded = {tuple(round(k, 9) for k in pos) for pos in positions.values()}
+    assert len(rounded) == len(positions)
+
+
+def test_neighbors_share_vertex_indices():
+    rng = random.Random(0x7E47)
+    for _ in range(1000):
+        cell = random_face(rng, rng.randint(0, 22))
+        edge = rng.randint(0, 2)
+        nbr, nbr_edge = find_neighbor(cell, edge)
+        v, w = face_vertices(cell), face_vertices(nbr)
+        assert v[(edge + 1) % 3] == w[(nbr_edge + 2) % 3]
+        assert v[(edge + 2) % 3] == w[(nbr_edge + 1) % 3]
+
+
+def test_vertex_index_is_stable_across_lods():
+    rng = random.Random(3)
+    for _ in range(300):
+        cell = random_face(rng, rng.randint(0, 21))
+        lod, d20, path, _ = unpack_face_idx(cell)
+        parent_vids = face_vertices(cell)
+        for k in range(3):
+            # Corner child k keeps the parent's corner k.
+            child = pack_face_idx(lod + 1, d20, path | (k << (2 * (22 - lod))))
+            assert face_vertices(child)[k] == parent_vids[k]
+        for vid in parent_vids:
+            assert unpack_vertex_idx(vid)[0] <= lod
+
+
+def test_vertex_position_matches_geometry():
+    rng = random.Random(0x905)
+    for _ in range(500):
+        cell = random_face(rng, rng.randint(0, 22))
+        for vid, pos in zip(face_vertices(cell), get_face_vertices(cell)):
+            assert _close(vertex_position(vid), pos)
+
+
+def test_vertex_position_rejects_bad_indices():
+    with pytest.raises(ValueError):
+        vertex_position(pack_vertex_idx(0, UNOWNED_D20, 12))
+    with pytest.raises(ValueError):
+        vertex_position(pack_vertex_idx(1, 3, (2 << 23) | 1))
+
+
+@pytest.mark.parametrize("lod", [0, 1, 2, 3])
+def test_faces_around_vertex_cover_every_incidence(lod):
+    faces = list(faces_at(lod))
+    incidences = {}
+    for face in faces:
+        for vid in face_vertices(face):
+            incidences.setdefault(vid, set()).add(face)
+    for vid, expected in incidences.items():
+        ring = faces_around_vertex(vid, lod)
+        assert len(ring) == len(set(ring)) == len(expected)
+        assert set(ring) == expected
+        assert len(ring) == (5 if unpack_vertex_idx(vid)[1] == UNOWNED_D20 else 6)
+
+
+def test_faces_around_vertex_ccw_and_adjacent():
+    from delta20.geometry import get_face_center, get_cross_product, get_dot_product
+    rng = random.Random(0x41)
+    for _ in range(200):
+        cell = random_face(rng, rng.randint(0, 22))
+        lod = unpack_face_idx(cell)[0]
+        vid = face_vertices(cell)[rng.randint(0, 2)]
+        ring = faces_around_vertex(vid, rng.randint(lod, 22))
+        p = vertex_position(vid)
+        for i, face in enumerate(ring):
+            following = ring[(i + 1) % len(ring)]
+            # Consecutive faces are edge neighbors, and turn CCW about the vertex.
+            assert following in (find_neighbor(face, e)[0] for e in range(3))
+            turn = get_cross_product(get_face_center(face), get_face_center(following), normalize=False)
+            assert get_dot_product(turn, p) > 0.0
+
+
+def test_faces_around_vertex_rejects_coarser_lods():
+    vid = face_vertices(pack_face_idx(5, 2, build_path(1, 3, 0, 2, 3)))[0]
+    with pytest.raises(ValueError):
+        faces_around_vertex(vid, unpack_vertex_idx(vid)[0] - 1)
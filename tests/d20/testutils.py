@@ -1,5 +1,6 @@
 from math import sqrt
 from typing import Dict, Tuple
+from delta20.packing import build_path, pack_face_idx
 from delta20.precomputed.canonical_d20 import CANONICAL_VERTS, CANONICAL_FACES, CANONICAL_NEIGHBORS
 
 # Tunable tolerances
@@ -43,3 +44,84 @@ def is_ccw_on_sphere(p0, p1, p2, eps=EPSILON):
 def undirected_edge_key(a, b):
     # return a sorted pair for undirected edge sets
     return (a, b) if a < b else (b, a)
+
+
+def random_face(rng, lod, d20_count=20):
+    # A random face at the given LOD, on one of the first d20_count d20 faces.
+    digits = [rng.randint(0, 3) for _ in range(lod)]
+    return pack_face_idx(lod, rng.randint(0, d20_count - 1), build_path(*digits) if digits else 0)
+
+
+def faces_at(lod):
+    # Every face at the given LOD, by d20 face and then path.
+    result = []
+    for d20 in range(20):
+        for i in range(4 ** lod):
+            digits = [(i >> (2 * k)) & 0b11 for k in reversed(range(lod))]
+            result.append(pack_face_idx(lod, d20, build_path(*digits) if digits else 0))
+    return result
+
+
+# The original descend/ascend neighbor finder, which walks the path one LOD at a time. It is kept
+# here as the reference that the closed-form find_neighbor() is checked against.
+def _get_nbr_chars(is_south, pos, edge, copolar):
+    if edge == 0:
+        return not is_south, 2 if pos == 1 else 1, 0
+    if edge == 1:
+        if copolar:
+            return is_south, 0 if pos == 0 else 1, 2
+        else:
+            return not is_south, 2 if pos == 0 else 0, 1
+    if edge == 2:
+        if copolar:
+            return is_south, 0 if pos == 0 else 2, 1
+        else:
+            return not is_south, 1 if pos == 0 else 0, 2
+
+
+def walk_find_neighbor(face_idx, edge):
+    from delta20.packing import pack_face_idx, unpack_face_idx
+    from delta20.precomputed.canonical_d20 import CANONICAL_FACES_INDEXED
+    from delta20.precomputed.raw_d20 import raw_neighbors
+
+    orig_lod, d20, path, is_south = unpack_face_idx(face_idx)
+    if orig_lod == 0:
+        nbr_d20 = raw_neighbors[d20][edge]
+        nbr_is_south = (CANONICAL_FACES_INDEXED[nbr_d20] & 1) != 0
+        _, _, nbr_edge = _get_nbr_chars(is_south, 0, edge, is_south == nbr_is_south)
+        return pack_face_idx(0, nbr_d20, 0, nbr_is_south), nbr_edge
+    lod = orig_lod
+    path >>= (23 - orig_lod) * 2
+
+    # Descend until we find the ancestor of the neighbor.
+    nbr_is_south = nbr_edge = nbr_pos = None
+    nbr_d20 = d20
+    path_rev = 0
+    pos = None
+    while lod > 0:
+        pos = path & 3
+        path >>= 2
+        path_rev = (path_rev << 2) | pos
+        if pos == 3:
+            nbr_is_south, nbr_pos, nbr_edge = not is_south, edge, edge
+            break
+        elif pos == edge:
+            nbr_is_south, nbr_pos, nbr_edge = not is_south, 3, edge
+            break
+        lod -= 1
+    if lod == 0:
+        nbr_d20 = raw_neighbors[d20][edge]
+        nbr_is_south = (CANONICAL_FACES_INDEXED[nbr_d20] & 1) != 0
+        _, nbr_pos, nbr_edge = _get_nbr_chars(is_south, pos, edge, nbr_is_south == is_south)
+        lod = 1
+
+    # Ascend, reflecting across the edge.
+    nbr_path = path
+    while lod <= orig_lod:
+        lod += 1
+        nbr_path = (nbr_path << 2) | nbr_pos
+        path_rev >>= 2
+        pos = path_rev & 3
+        _, nbr_pos, _ = _get_nbr_chars(is_south, pos, edge, nbr_is_south == is_south)
+    nbr_path <<= (23 - orig_lod) * 2
+    return pack_face_idx(orig_lod, nbr_d20, nbr_path, nbr_is_south), nbr_edge
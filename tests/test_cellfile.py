@@ -0,0 +1,85 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+from delta20.cellfile import CellFile, write_cells  # noqa: E402
+from delta20.batch import locate_many  # noqa: E402
+
+
+def _dataset(count, seed):
+    rng = np.random.default_rng(seed)
+    lat, lon = np.radians(rng.uniform(-90, 90, count)), np.radians(rng.uniform(-180, 180, count))
+    cells = np.unique(locate_many(lat, lon, 14))
+    rng.shuffle(cells)
+    return cells, {"height": rng.normal(size=len(cells)).astype(np.float32),
+                   "class": rng.integers(0, 255, len(cells)).astype(np.uint8),
+                   "name": np.array([f"c{i}" for i in range(len(cells))], dtype="S6")}
+
+
+def test_round_trip(tmp_path):
+    cells, columns = _dataset(5000, 1)
+    path = str(tmp_path / "cells.d20")
+    write_cells(path, cells, columns)
+    order = np.argsort(cells)
+    with CellFile(path) as f:
+        assert len(f) == len(cells)
+        assert list(f) == ["height", "class", "name"]
+        assert np.array_equal(f.keys, cells[order])
+        for name, values in columns.items():
+            assert f[name].dtype == values.dtype
+            assert np.array_equal(f[name], values[order])
+        # The columns are views onto the mapping, not copies.
+        assert not f.keys.flags.owndata and not f.keys.flags.writeable
+        assert f.keys.base is not None
+
+
+def test_views_outlive_close(tmp_path):
+    cells, columns = _dataset(500, 4)
+    path = str(tmp_path / "cells.d20")
+    write_cells(path, cells, columns)
+    with CellFile(path) as f:
+        keys, heights = f.keys, f["height"]
+    # The mapping stays alive for the views still held.
+    order = np.argsort(cells)
+    assert np.array_equal(keys, cells[order]) and np.array_equal(heights, columns["height"][order])
+
+
+def test_lookups(tmp_path):
+    cells, columns = _dataset(2000, 2)
+    path = str(tmp_path / "cells.d20")
+    write_cells(path, cells, columns)
+    with CellFile(path) as f:
+        rows = f.find(cells)
+        assert np.array_equal(f.keys[rows], cells)
+        assert np.array_equal(f["height"][rows], columns["height"])
+        missing = np.setdiff1d(_dataset(200, 3)[0], cells)
+        assert np.all(f.find(missing) == -1)
+        assert f.find(int(missing[0])) == -1
+        record = f.get(int(cells[7]))
+        assert record["class"] == columns["class"][7] and record["name"] == columns["name"][7]
+        assert f.get(int(missing[0])) is None
+
+
+def test_empty_and_keys_only(tmp_path):
+    path = str(tmp_path / "empty.d20")
+    write_cells(path, np.array([], dtype=np.uint64))
+    with CellFile(path) as f:
+        assert len(f) == 0 and f.columns == {}
+        assert f.find(12345) == -1
+
+
+def test_invalid(tmp_path):
+    path = str(tmp_path / "bad.d20")
+    with pytest.raises(ValueError):
+        write_cells(path, np.array([3, 1, 3], dtype=np.uint64))
+    with pytest.raises(ValueError):
+        write_cells(path, np.array([1, 2], dtype=np.uint64), {"x": np.zeros(3)})
+    with pytest.raises(ValueError):
+        write_cells(path, np.array([1, 2], dtype=np.uint64), {"x": np.array([None, None])})
+
+    write_cells(path, np.array([1, 2], dtype=np.uint64), {"x": np.zeros(2)})
+    data = open(path, "rb").read()
+    for broken in (b"", b"NOTCELLS" + data[8:], data[:-8]):
+        with open(path, "wb") as f:
+            f.write(broken)
+        with pytest.raises(ValueError):
+            CellFile(path)
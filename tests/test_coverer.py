@@ -0,0 +1,100 @@
+import math
+import random
+import pytest
+
+from delta20.coverer import LatLonRect, Polygon, Region, RegionCoverer, SphericalCap
+from delta20.geometry import get_face_vertices, get_vector, locate
+from delta20.packing import is_ancestor, unpack_face_idx
+
+
+def _random_unit(rng):
+    x, y, z = rng.gauss(0, 1), rng.gauss(0, 1), rng.gauss(0, 1)
+    r = math.sqrt(x * x + y * y + z * z)
+    return x / r, y / r, z / r
+
+
+def _regions():
+    rad = math.radians
+    return [
+        SphericalCap(get_vector(rad(40), rad(-70)), rad(5)),
+        SphericalCap(get_vector(rad(-10), rad(100)), rad(120)),
+        LatLonRect(rad(30), rad(170), rad(60), rad(-160)),
+        LatLonRect(rad(80), rad(-180), rad(90), rad(180)),
+        Polygon([get_vector(rad(lat), rad(lon)) for lat, lon in [(0, 0), (0, 10), (10, 10), (5, 5), (10, 0)]]),
+    ]
+
+
+@pytest.mark.parametrize("region", _regions())
+def test_coverings_are_sound(region):
+    coverer = RegionCoverer(max_lod=10, max_cells=20)
+    covering, interior = coverer.get_covering(region), coverer.get_interior_covering(region)
+    for cells in (covering, interior):
+        assert cells == sorted(cells)
+        assert len(cells) <= 20
+        assert all(unpack_face_idx(c)[0] <= 10 for c in cells)
+        assert all(not is_ancestor(a, b) for a in cells for b in cells if a != b)
+    assert interior
+
+    # Every point of the region lies in the covering, and every point of the interior covering lies
+    # in the region.
+    rng = random.Random(0xC0FE)
+    for _ in range(2000):
+        p = _random_unit(rng)
+        leaf = locate(*p, 10)
+        if region.contains_point(p):
+            assert any(is_ancestor(c, leaf) for c in covering)
+        if any(is_ancestor(c, leaf) for c in interior):
+            assert region.contains_point(p)
+    for cell in interior:
+        assert region.contains_triangle(*get_face_vertices(cell))
+
+
+def test_budget_and_lod_limits():
+    cap = SphericalCap(get_vector(0.3, 0.2), 0.05)
+    for max_cells in (1, 4, 8, 50):
+        covering = RegionCoverer(max_lod=16, max_cells=max_cells).get_covering(cap)
+        assert 1 <= len(covering) <= max_cells
+    assert all(unpack_face_idx(c)[0] >= 6 for c in RegionCoverer(min_lod=6, max_lod=8).get_covering(cap))
+    assert all(unpack_face_idx(c)[0] == 5 for c in RegionCoverer(min_lod=5, max_lod=5).get_covering(cap))
+    # A finer budget gives a tighter fit.
+    loose = RegionCoverer(max_lod=16, max_cells=4).get_covering(cap)
+    tight = RegionCoverer(max_lod=16, max_cells=50).get_covering(cap)
+    assert all(any(is_ancestor(a, b) for a in loose) for b in tight)
+
+
+def test_region_triangle_tests():
+    rng = random.Random(7)
+    cap = SphericalCap((0.0, 1.0, 0.0), math.radians(30))
+    rect = LatLonRect(math.radians(60), -math.pi, math.pi / 2, math.pi)
+    for _ in range(300):
+        lod = rng.randint(0, 6)
+        cell = locate(*_random_unit(rng), lod)
+        triangle = get_face_vertices(cell)
+        # The cap of 30 degrees around the north pole is exactly the box above latitude 60.
+        assert cap.contains_triangle(*triangle) == rect.contains_triangle(*triangle)
+        if cap.intersects_triangle(*triangle):
+            assert rect.intersects_triangle(*triangle)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        RegionCoverer(min_lod=5, max_lod=4)
+    with pytest.raises(ValueError):
+        RegionCoverer(max_cells=0)
+    with pytest.raises(ValueError):
+        SphericalCap((1.0, 0.0, 0.0), 4.0)
+    with pytest.raises(ValueError):
+        LatLonRect(0.5, 0.0, 0.4, 1.0)
+    with pytest.raises(ValueError):
+        Polygon([(1.0, 0.0, 0.0), (-1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, -1.0, 0.0)])
+
+    # A region missing one of the tests fails when it is made, not partway through a covering.
+    class Incomplete(Region):
+        def contains_point(self, p):
+            return False
+
+        def intersects_triangle(self, a, b, c):
+            return False
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -1,6 +1,7 @@
 # tests/test_geometry.py
 
 import math
+import random
 import pytest
 
 from delta20.geometry import (
@@ -11,7 +12,17 @@ from delta20.geometry import (
     get_vector_length,
     get_vector,
     get_shortest_arc,
+    get_midpoint,
+    locate,
+    locate_lat_long,
+    get_face_vertices,
+    get_face_center,
+    get_face_area,
 )
+from delta20.indexing import find_neighbor
+from delta20.packing import build_path, pack_face_idx, unpack_face_idx, get_pos
+from delta20.precomputed.canonical_d20 import CANONICAL_VERTS, CANONICAL_FACES, CANONICAL_FACES_INDEXED
+from d20.testutils import random_face
 
 EPS = 1e-12
 ANGLE_EPS = 1e-10  # radians
@@ -430,3 +441,128 @@ def test_get_shortest_arc_raises_on_identical_or_antipodal():
     with pytest.raises(ValueError):
         get_shortest_arc(b, a)
 '''
+
+
+# --- locate ---
+
+def _cell_corners(face_idx):
+    # Test-local subdivision: corner children keep their corner, the center is (M12, M20, M01).
+    lod, d20, path, _ = unpack_face_idx(face_idx)
+    a, b, c = (CANONICAL_VERTS[v] for v in CANONICAL_FACES[CANONICAL_FACES_INDEXED[d20]])
+    for level in range(lod):
+        m01, m12, m20 = get_midpoint(a, b), get_midpoint(b, c), get_midpoint(c, a)
+        a, b, c = ((a, m01, m20), (m01, b, m12), (m20, m12, c), (m12, m20, m01))[get_pos(path, level)]
+    return a, b, c
+
+
+def test_get_midpoint_is_unit_and_equidistant():
+    a, b = get_vector(0.3, -1.0), get_vector(-0.2, 0.4)
+    m = get_midpoint(a, b)
+    assert almost(get_vector_length(*m), 1.0)
+    assert almost(get_dot_product(a, m), get_dot_product(b, m))
+
+
+def test_locate_d20_faces():
+    for d20, fi in enumerate(CANONICAL_FACES_INDEXED):
+        a, b, c = (CANONICAL_VERTS[v] for v in CANONICAL_FACES[fi])
+        center = get_normalized(a[0] + b[0] + c[0], a[1] + b[1] + c[1], a[2] + b[2] + c[2])
+        assert locate(*center, 0) == fi
+        # Non-unit inputs locate the same.
+        assert locate(*(3.5 * k for k in center), 0) == fi
+
+
+def test_locate_finds_cell_centers():
+    rng = random.Random(0x10CA7E)
+    for _ in range(500):
+        cell = random_face(rng, rng.randint(0, 22))
+        a, b, c = _cell_corners(cell)
+        center = get_normalized(a[0] + b[0] + c[0], a[1] + b[1] + c[1], a[2] + b[2] + c[2])
+        assert locate(*center, unpack_face_idx(cell)[0]) == cell
+
+
+def test_locate_is_consistent_across_lods():
+    rng = random.Random(5)
+    for _ in range(200):
+        p = get_vector(rng.uniform(-math.pi / 2, math.pi / 2), rng.uniform(-math.pi, math.pi))
+        deepest = locate(*p, 22)
+        _, d20, path, _ = unpack_face_idx(deepest)
+        for lod in range(22):
+            prefix = path & ~((1 << ((23 - lod) * 2)) - 1)
+            assert locate(*p, lod) == pack_face_idx(lod, d20, prefix)
+
+
+def test_locate_lat_long_matches_vector():
+    rng = random.Random(11)
+    for _ in range(100):
+        lat, lon = rng.uniform(-math.pi / 2, math.pi / 2), rng.uniform(-math.pi, math.pi)
+        assert locate_lat_long(lat, lon, 15) == locate(*get_vector(lat, lon), 15)
+    # The poles are corners of five d20 faces; any of them will do, but it must be one of them.
+    assert unpack_face_idx(locate_lat_long(math.pi / 2, 0.0, 0))[1] in range(0, 5)
+    assert unpack_face_idx(locate_lat_long(-math.pi / 2, 0.0, 0))[1] in range(15, 20)
+
+
+def test_locate_rejects_bad_input():
+    with pytest.raises(ValueError):
+        locate(1.0, 0.0, 0.0, 23)
+    with pytest.raises(ValueError):
+        locate(0.0, 0.0, 0.0, 4)
+
+
+# --- cell geometry ---
+
+def _close(u, v, eps=1e-12):
+    return all(abs(p - q) <= eps for p, q in zip(u, v))
+
+
+def test_face_vertices_of_d20_faces_are_canonical():
+    for fi in CANONICAL_FACES_INDEXED:
+        expected = tuple(CANONICAL_VERTS[v] for v in CANONICAL_FACES[fi])
+        assert get_face_vertices(fi) == expected
+        assert _close(get_face_center(fi), get_face_center(CANONICAL_FACES[fi]))
+
+
+def test_face_vertices_match_subdivision():
+    rng = random.Random(0xC0FFEE)
+    for _ in range(300):
+        cell = random_face(rng, rng.randint(0, 22))
+        for got, expected in zip(get_face_vertices(cell), _cell_corners(cell)):
+            assert _close(got, expected)
+
+
+def test_face_vertices_are_ccw():
+    # CCW seen from outside the sphere, at every LOD.
+    rng = random.Random(21)
+    for _ in range(300):
+        cell = random_face(rng, rng.randint(0, 12))
+        a, b, c = get_face_vertices(cell)
+        normal = get_cross_product((b[0] - a[0], b[1] - a[1], b[2] - a[2]),
+                                   (c[0] - a[0], c[1] - a[1], c[2] - a[2]), normalize=False)
+        assert get_dot_product(normal, get_face_center(cell)) > 0.0
+
+
+def test_neighbors_share_reversed_edges():
+    # Crossing edge e lands on a face whose return edge has the same two corners, reversed.
+    rng = random.Random(0xED6E)
+    for _ in range(500):
+        cell = random_face(rng, rng.randint(0, 22))
+        edge = rng.randint(0, 2)
+        nbr, nbr_edge = find_neighbor(cell, edge)
+        v, w = get_face_vertices(cell), get_face_vertices(nbr)
+        assert _close(v[(edge + 1) % 3], w[(nbr_edge + 2) % 3])
+        assert _close(v[(edge + 2) % 3], w[(nbr_edge + 1) % 3])
+
+
+def test_face_center_is_located_in_face():
+    rng = random.Random(99)
+    for _ in range(200):
+        cell = random_face(rng, rng.randint(0, 22))
+        assert locate(*get_face_center(cell), unpack_face_idx(cell)[0]) == cell
+
+
+def test_face_areas_cover_the_sphere():
+    total = sum(get_face_area(fi) for fi in CANONICAL_FACES_INDEXED)
+    assert abs(total - 4.0 * math.pi) <= 1e-12
+    for fi in CANONICAL_FACES_INDEXED[:3]:
+        _, d20, _, _ = unpack_face_idx(fi)
+        children = [pack_face_idx(2, d20, build_path(i, j)) for i in range(4) for j in range(4)]
+        assert abs(sum(get_face_area(c) for c in children) - get_face_area(fi)) <= 1e-12
@@ -1,3 +1,12 @@
 def test_import():
     import delta20
     assert hasattr(delta20, "__version__")
+
+
+def test_backend_reported():
+    import delta20
+    from delta20 import indexing, packing
+    assert delta20.BACKEND in ("python", "mypyc")
+    compiled = not packing.__file__.endswith(".py")
+    assert compiled == (delta20.BACKEND == "mypyc")
+    assert compiled == (not indexing.__file__.endswith(".py"))
@@ -0,0 +1,51 @@
+from __future__ import annotations
+from typing import List, Optional, Tuple
+from delta20.precomputed.canonical_d20 import CANONICAL_FACES, CANONICAL_FACES_INDEXED
+
+
+# This code is not intended for running in the main app. It finds the order in which the curve in
+# delta20/curve.py visits the d20 faces, which is then hard-coded there as _D20_CURVE.
+#
+# Within a face, the curve runs from one corner (where it enters) to another (where it leaves). For
+# the curve to be continuous, each face must be entered at the corner where the previous one was
+# left, and for it to keep locality, consecutive faces must share an edge. Closing the loop (the last
+# face is left where the first was entered) makes the curve continuous end to end as well.
+def get_chain() -> Optional[List[Tuple[int, int, int]]]:
+    corners = [CANONICAL_FACES[fi] for fi in CANONICAL_FACES_INDEXED]
+
+    def share_edge(a: int, b: int) -> bool:
+        return len(set(corners[a]) & set(corners[b])) == 2
+
+    # A plain depth-first search, trying lower-numbered faces and corners first. It is quick, since
+    # each face has only 3 neighbors.
+    def search(chain: List[Tuple[int, int, int]], used: List[bool]) -> bool:
+        d20, _, exit_corner = chain[-1]
+        vertex = corners[d20][exit_corner]
+        if len(chain) == 20:
+            first, first_entry, _ = chain[0]
+            return corners[first][first_entry] == vertex and share_edge(d20, first)
+        for nbr in range(20):
+            if used[nbr] or not share_edge(d20, nbr) or vertex not in corners[nbr]:
+                continue
+            entry = corners[nbr].index(vertex)
+            for exit_corner in range(3):
+                if exit_corner == entry:
+                    continue
+                chain.append((nbr, entry, exit_corner))
+                used[nbr] = True
+                if search(chain, used):
+                    return True
+                chain.pop()
+                used[nbr] = False
+        return False
+
+    for entry in range(3):
+        for exit_corner in range(3):
+            chain = [(0, entry, exit_corner)]
+            if entry != exit_corner and search(chain, [True] + [False] * 19):
+                return chain
+    return None
+
+
+if __name__ == '__main__':
+    print(f"_D20_CURVE: Final = {tuple(get_chain() or ())}")